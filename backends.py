@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Interchangeable implementations of the behaviours of the agents.
+
+This script defines the backends which apply the behaviours of framework.Sheep
+and framework.Wolf to a population.Population: moving, eating, sharing with
+neighbours, reproducing and wolves eating sheep. Every backend gives the same
+results for the same random number generator, so a simulation can use
+whichever is fastest without changing its results.
+
+    python: The reference, which calls the methods of framework.Sheep and
+            framework.Wolf on each agent in turn
+    numpy:  Applies each behaviour to the whole population with array
+            operations, as the methods of population.Population
+    numba:  As numpy, with sharing and wolves eating sheep compiled by Numba.
+            Only available when Numba is installed.
+
+The backend used by default is the fastest available, unless one is named by
+the POPULATION_BACKEND environment variable.
+
+  Typical usage example:
+
+  backend = get("numpy")
+  backend.move(flock, rng)
+  backend.share(flock, neighbourhood)
+"""
+
+# Import required modules
+import importlib.util
+import os
+import numpy
+
+
+# Names of the backends, from slowest to fastest
+NAMES = ("python", "numpy", "numba")
+
+# Environment variable naming the backend used by default
+VARIABLE = "POPULATION_BACKEND"
+
+
+class NumpyBackend:
+    """NumpyBackend class, used to apply behaviours with array operations.
+
+    Each method applies a behaviour to every agent of a population at once.
+    Other backends subclass it and replace the behaviours they implement
+    differently.
+
+    Attributes:
+        name: Name of the backend within NAMES
+    """
+    name = "numpy"
+
+    def move(self, agents, rng, cost=0.0):
+        """Randomly moves every agent, as Population.move."""
+        agents.move(rng, cost)
+
+    def graze(self, flock):
+        """Lets every sheep eat from its cell, as Population.graze.
+
+        Returns:
+            Tuple of the flat indices of cells grazed and the amount taken
+            from each
+        """
+        return flock.graze()
+
+    def share(self, flock, neighbourhood):
+        """Lets every sheep share with its neighbours, as Population.share."""
+        flock.share(neighbourhood)
+
+    def reproduce(self, agents, threshold):
+        """Every agent whose store has reached threshold reproduces, as
+        Population.reproduce.
+
+        Returns:
+            Number of agents born
+        """
+        return agents.reproduce(threshold)
+
+    def predate(self, wolves, prey):
+        """Lets every wolf eat an adjacent sheep, as Population.predate.
+
+        Returns:
+            Array of the indices of the sheep which have been eaten
+        """
+        return wolves.predate(prey)
+
+
+class PythonBackend(NumpyBackend):
+    """PythonBackend class, the reference implementation of the behaviours.
+
+    Agents are visited one at a time through the Sheep and Wolf views of the
+    population, calling the methods of framework wherever they can be used
+    as they are. Moves use the same random numbers as Population.move, drawn
+    for every agent before any agent moves.
+    """
+    name = "python"
+
+    def move(self, agents, rng, cost=0.0):
+        """Randomly moves every agent, as framework.Agent.move."""
+        bottom, right = (size - 1 for size in agents.environment.shape)
+        downs = (rng.random(len(agents)) < 0.5).tolist()
+        rights = (rng.random(len(agents)) < 0.5).tolist()
+        for agent, down, move_right in zip(agents, downs, rights):
+            if agent.y == bottom:
+                agent.y -= 1
+            elif agent.y == 0:
+                agent.y += 1
+            elif down:
+                agent.y += 1
+            else:
+                agent.y -= 1
+            if agent.x == right:
+                agent.x -= 1
+            elif agent.x == 0:
+                agent.x += 1
+            elif move_right:
+                agent.x += 1
+            else:
+                agent.x -= 1
+            if cost:
+                agent.store -= cost
+
+    def graze(self, flock):
+        """Lets every sheep eat from its cell, with framework.Sheep.eat.
+
+        Returns:
+            Tuple of the flat indices of cells grazed and the amount taken
+            from each
+        """
+        flat = flock.environment.reshape(-1)
+        cells = numpy.unique(flock.y * flock.environment.shape[1] + flock.x)
+        before = flat[cells]
+        stores = flock.store.copy()
+        for sheep in flock:
+            sheep.eat()
+        flock.fed[flock.store > stores] = True
+        return cells, before - flat[cells]
+
+    def share(self, flock, neighbourhood):
+        """Lets every sheep share with its neighbours, with
+        framework.Sheep.share_with_neighbours."""
+        for sheep in flock:
+            sheep.share_with_neighbours(neighbourhood)
+
+    def reproduce(self, agents, threshold):
+        """Every agent whose store has reached threshold reproduces.
+
+        As framework.Sheep.reproduce and framework.Wolf.reproduce, except
+        that births are held back until Population.apply_births is called.
+
+        Returns:
+            Number of agents born
+        """
+        xs = []
+        ys = []
+        for agent in agents:
+            if agent.store >= threshold:
+                agent.store = 0
+                xs.append(agent.x)
+                ys.append(agent.y)
+        if xs:
+            agents.defer_births(xs, ys)
+        return len(xs)
+
+    def predate(self, wolves, prey):
+        """Lets every wolf eat an adjacent sheep, with framework.Wolf.eat.
+
+        Returns:
+            Array of the indices of the sheep which have been eaten
+        """
+        claimed = set()
+        eaten = []
+        for wolf in wolves:
+            i = wolf.eat(prey, claimed)
+            if i is not None:
+                eaten.append(i)
+                wolves.fed[wolf.index] = True
+        return numpy.array(eaten, dtype=numpy.int64)
+
+
+def _sorted_cells(xs, ys, cell_size):
+    """Sorts agents by the cell of a grid they lie within.
+
+    Only the cells holding agents are listed, so the memory taken follows the
+    number of agents rather than the size of the grid.
+
+    Returns:
+        Tuple of the agent indices ordered by cell and then by index, the
+        sorted indices of the occupied cells, the first position of each
+        occupied cell within that order followed by the number of agents,
+        the number of cells across the grid and the number of cells down it
+    """
+    columns = int(xs.max()) // cell_size + 1
+    rows = int(ys.max()) // cell_size + 1
+    cells = (ys // cell_size) * columns + xs // cell_size
+    order = numpy.argsort(cells, kind="stable")
+    occupied, starts = numpy.unique(cells[order], return_index=True)
+    starts = numpy.append(starts, len(cells))
+    return order, occupied, starts, columns, rows
+
+
+def _compile(jit=True):
+    """Compiles the Numba kernels of NumbaBackend.
+
+    Args:
+        jit: If False the kernels are left as plain Python functions, so that
+             they can be checked without Numba
+
+    Returns:
+        Tuple of the share and predate kernels
+    """
+    if jit:
+        import numba
+        njit = numba.njit
+    else:
+        def njit(function):
+            return function
+
+    @njit
+    def near(x, y, span, cell_size, order, occupied, starts, columns, rows,
+             found):
+        # Fills found with the agents of the cells within span cells of x, y
+        # in ascending order, and returns how many there are
+        count = 0
+        cell_x = x // cell_size
+        cell_y = y // cell_size
+        for j in range(max(cell_y - span, 0), min(cell_y + span + 1, rows)):
+            for i in range(max(cell_x - span, 0),
+                           min(cell_x + span + 1, columns)):
+                cell = j * columns + i
+                at = numpy.searchsorted(occupied, cell)
+                if at == len(occupied) or occupied[at] != cell:
+                    continue
+                for k in range(starts[at], starts[at + 1]):
+                    found[count] = order[k]
+                    count += 1
+        found[:count].sort()
+        return count
+
+    @njit
+    def share(xs, ys, stores, neighbourhood, cell_size, order, occupied,
+              starts, columns, rows):
+        span = 1 if neighbourhood > 0 else 0
+        limit = neighbourhood * neighbourhood
+        found = numpy.empty(len(xs), dtype=numpy.int64)
+        for i in range(len(xs)):
+            count = near(xs[i], ys[i], span, cell_size, order, occupied,
+                         starts, columns, rows, found)
+            for k in range(count):
+                j = found[k]
+                dx = xs[i] - xs[j]
+                dy = ys[i] - ys[j]
+                if dx * dx + dy * dy <= limit:
+                    ave = (stores[i] + stores[j]) / 2
+                    stores[i] = ave
+                    stores[j] = ave
+
+    @njit
+    def predate(wolf_xs, wolf_ys, order, occupied, starts, columns, rows,
+                count):
+        claimed = numpy.zeros(count, dtype=numpy.bool_)
+        eaten = numpy.empty(len(wolf_xs), dtype=numpy.int64)
+        hunters = numpy.empty(len(wolf_xs), dtype=numpy.int64)
+        found = numpy.empty(count, dtype=numpy.int64)
+        kills = 0
+        for j in range(len(wolf_xs)):
+            total = near(wolf_xs[j], wolf_ys[j], 1, 1, order, occupied,
+                         starts, columns, rows, found)
+            for k in range(total):
+                i = found[k]
+                if not claimed[i]:
+                    claimed[i] = True
+                    eaten[kills] = i
+                    hunters[kills] = j
+                    kills += 1
+                    break
+        return eaten[:kills], hunters[:kills]
+
+    return share, predate
+
+
+class NumbaBackend(NumpyBackend):
+    """NumbaBackend class, used to compile sharing and predation.
+
+    Sheep are sorted by the cell of the spatial grid they lie within, and
+    the compiled kernels visit sheep and wolves in the same order as
+    Population.share and Population.predate. The kernels are compiled when
+    the backend is first created.
+    """
+    name = "numba"
+
+    def __init__(self, jit=True):
+        """Inits NumbaBackend, compiling its kernels unless jit is False, in
+        which case they run as plain Python."""
+        self._share, self._predate = _compile(jit)
+
+    def share(self, flock, neighbourhood):
+        """Lets every sheep share with its neighbours, as Population.share."""
+        if len(flock) == 0:
+            return
+        cell_size = max(int(numpy.ceil(neighbourhood)), 1)
+        xs = flock.x.copy()
+        ys = flock.y.copy()
+        stores = flock.store.copy()
+        self._share(xs, ys, stores, neighbourhood, cell_size,
+                    *_sorted_cells(xs, ys, cell_size))
+        flock.store[:] = stores
+
+    def predate(self, wolves, prey):
+        """Lets every wolf eat an adjacent sheep, as Population.predate.
+
+        Returns:
+            Array of the indices of the sheep which have been eaten
+        """
+        if len(prey) == 0 or len(wolves) == 0:
+            return numpy.empty(0, dtype=numpy.int64)
+        xs = prey.x.copy()
+        ys = prey.y.copy()
+        eaten, hunters = self._predate(wolves.x.copy(), wolves.y.copy(),
+                                       *_sorted_cells(xs, ys, 1), len(prey))
+        wolves.store[hunters] += 1
+        wolves.fed[hunters] = True
+        return eaten
+
+
+# Classes of the backends, by name
+_CLASSES = {"python": PythonBackend, "numpy": NumpyBackend,
+            "numba": NumbaBackend}
+
+# Backends created so far, by name
+_created = {}
+
+
+def available():
+    """Returns the names of the backends which can be used here, from slowest
+    to fastest."""
+    return [name for name in NAMES
+            if name != "numba" or importlib.util.find_spec("numba")]
+
+
+def get(name=None):
+    """Returns a backend.
+
+    Args:
+        name: Name of the backend within NAMES. By default the backend named
+              by the POPULATION_BACKEND environment variable is used, or
+              failing that the fastest backend available.
+
+    Returns:
+        The backend, shared by every caller asking for the same name
+
+    Raises:
+        ValueError: If the backend is unknown or can not be used here
+    """
+    if name is None:
+        name = os.environ.get(VARIABLE) or available()[-1]
+    if name not in available():
+        raise ValueError("Backend '{}' is not available, choose from: "
+                         "{}".format(name, ", ".join(available())))
+    backend = _created.get(name)
+    if backend is None:
+        backend = _created[name] = _CLASSES[name]()
+    return backend
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Benchmarks how a step of the population model scales, how long the model
+takes to import and how much memory each agent takes.
+
+This script times each phase of a model step (sheep move, eat, share and
+reproduce, wolf predation, mortality and regrowth) separately. Starting from a
+base case, the size of the flock, the size of the wolf pack, the neighbourhood
+radius and the size of the environment are varied one at a time. Every case is
+built from a fixed seed and timed over several fresh repeats. Results are
+written to a .json file so that they can be compared between commits, and a
+previous results file can be given to report any phase which has become slower.
+The memory held per agent, both by framework agent objects and by array backed
+populations, can be checked against a budget in bytes.
+
+  Typical usage example:
+
+  python benchmark.py --output bench.json
+  python benchmark.py --output new.json --compare bench.json
+  python benchmark.py --imports
+  python benchmark.py --memory
+  python benchmark.py --backends
+  python benchmark.py --tracking
+"""
+
+# Import required modules
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy
+import backends
+import environment
+import framework
+import population
+import simulation
+import tracking
+
+
+# Case from which each parameter is varied
+BASE = {"sheep": 1000, "wolves": 50, "neighbourhood": 5, "grid": 100}
+
+# Values taken by each parameter while the others are held at BASE
+SWEEPS = {"sheep": [100, 1000, 10000],
+          "wolves": [10, 100, 1000],
+          "neighbourhood": [2, 5, 10, 20],
+          "grid": [100, 300, 1000]}
+
+# Modules used without a display, e.g. by worker processes and the command
+# line, which must import quickly
+HEADLESS = ("simulation", "sweep", "population")
+
+# Dependencies only needed for drawing, downloading or the GUI
+HEAVY = ("matplotlib", "tkinter", "requests", "bs4")
+
+# Phases of a step, in the order Simulation.step applies them
+PHASES = (("move", lambda model: model.backend.move(model.flock, model.rng)),
+          ("eat", lambda model: model.backend.graze(model.flock)),
+          ("share_with_neighbours", lambda model: model.backend.share(
+              model.flock, model.neighbourhood)),
+          ("reproduce", lambda model: model.backend.reproduce(
+              model.flock, model.sheep_threshold)),
+          ("wolf_eat",
+           lambda model: model.backend.predate(model.wolves, model.flock)),
+          ("mortality", lambda model: model.flock.remove(
+              model.flock.mortality(model.rng, 0.1))),
+          ("regrow", lambda model: environment.regrow(
+              model.environment, 0.01, 250, 0.1, model.rng)))
+
+
+def cases(base=BASE, sweeps=SWEEPS):
+    """Lists the cases to benchmark, varying one parameter at a time."""
+    found = []
+    for name, values in sweeps.items():
+        for value in values:
+            case = dict(base)
+            case[name] = value
+            if case not in found:
+                found.append(case)
+    return found
+
+
+def build(case, seed, backend=None):
+    """Builds a seeded simulation for a benchmark case.
+
+    Agents are placed at random within the domain and given random stores,
+    and the environment is filled with random resources. The behaviours of
+    the agents are applied by the backend named, by default the fastest.
+    """
+    rng = numpy.random.default_rng(seed)
+    grid = case["grid"]
+    environment = rng.uniform(0, 250, (grid, grid))
+    flock = population.Population(environment, framework.Sheep)
+    flock.extend(rng.integers(0, grid, case["sheep"]),
+                 rng.integers(0, grid, case["sheep"]),
+                 rng.uniform(0, 100, case["sheep"]))
+    wolves = population.Population(environment, framework.Wolf)
+    wolves.extend(rng.integers(0, grid, case["wolves"]),
+                  rng.integers(0, grid, case["wolves"]),
+                  numpy.zeros(case["wolves"]))
+    return simulation.Simulation(environment, flock, wolves,
+                                 case["neighbourhood"], 1, 100, seed=seed,
+                                 backend=backend)
+
+
+def time_case(case, repeats=5, seed=0, backend=None):
+    """Times every phase of one step for a benchmark case.
+
+    Each repeat builds the case afresh from the seed, so every repeat times
+    exactly the same work.
+
+    Returns:
+        Dictionary mapping each phase, and "step", to its median time in
+        seconds
+    """
+    timings = {name: [] for name, phase in PHASES}
+    timings["step"] = []
+    for repeat in range(repeats):
+        model = build(case, seed, backend)
+        total = 0.0
+        for name, phase in PHASES:
+            start = time.perf_counter()
+            phase(model)
+            elapsed = time.perf_counter() - start
+            timings[name].append(elapsed)
+            total += elapsed
+        timings["step"].append(total)
+    return {name: float(numpy.median(values))
+            for name, values in timings.items()}
+
+
+def import_time(module):
+    """Measures the time taken to import a module in a fresh interpreter.
+
+    Args:
+        module: Name of the module to import
+
+    Returns:
+        Tuple of the import time in seconds and a sorted list of the modules
+        within HEAVY which were imported along with it
+    """
+    code = ("import json, sys, {0}; print(json.dumps(sorted(m for m in {1!r} "
+            "if m in sys.modules)))".format(module, HEAVY))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                                code], check=True, capture_output=True,
+                               text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    # The last line of the report for a module holds its cumulative time
+    seconds = 0.0
+    for line in completed.stderr.splitlines():
+        match = re.match(r"import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*(\S+)$",
+                         line)
+        if match and match.group(2) == module:
+            seconds = int(match.group(1)) / 1e6
+    return seconds, json.loads(completed.stdout)
+
+
+def check_imports(budget=0.25):
+    """Checks that every HEADLESS module imports within budget seconds and
+    without any HEAVY dependency.
+
+    Returns:
+        List of messages describing each failure
+    """
+    failures = []
+    for module in HEADLESS:
+        seconds, heavy = import_time(module)
+        print("import {:<12} {:.3f}s {}".format(module, seconds,
+                                                " ".join(heavy)))
+        if seconds > budget:
+            failures.append("{} took {:.3f}s to import, over the budget of "
+                            "{:.3f}s".format(module, seconds, budget))
+        if heavy:
+            failures.append("{} imported {}".format(module, ", ".join(heavy)))
+    return failures
+
+
+def memory_per_agent(count=100000, grid=1000):
+    """Measures the memory held per agent.
+
+    Sheep are created with float stores at random locations of a grid x grid
+    environment, first as a list of framework.Sheep objects sharing a World
+    and then as a Population.
+
+    Returns:
+        Dictionary of the bytes per agent of "objects" and "arrays"
+    """
+    environment = numpy.zeros((grid, grid))
+    random.seed(0)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        flock = []
+        world = framework.World(flock, environment)
+        for i in range(count):
+            sheep = framework.Sheep(world)
+            sheep.store = float(i)
+            flock.append(sheep)
+        objects = tracemalloc.get_traced_memory()[0] - before
+        del flock, world, sheep
+        before = tracemalloc.get_traced_memory()[0]
+        agents = population.Population(environment, framework.Sheep)
+        agents.extend(numpy.random.default_rng(0).integers(0, grid, count),
+                      numpy.random.default_rng(1).integers(0, grid, count),
+                      numpy.arange(count, dtype=numpy.float64))
+        arrays = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return {"objects": objects / count, "arrays": arrays / count}
+
+
+def check_memory(object_budget=160, array_budget=48):
+    """Checks that agents fit within a budget of bytes per agent.
+
+    Returns:
+        List of messages describing each failure
+    """
+    failures = []
+    measured = memory_per_agent()
+    for kind, budget in (("objects", object_budget),
+                         ("arrays", array_budget)):
+        print("{:<8} {:.1f} bytes/agent".format(kind, measured[kind]))
+        if measured[kind] > budget:
+            failures.append("Agent {} take {:.1f} bytes each, over the budget "
+                            "of {} bytes".format(kind, measured[kind],
+                                                 budget))
+    return failures
+
+
+def check_backends(iterations=20, seed=0):
+    """Checks that every backend available gives the same results as the
+    python reference backend.
+
+    Each backend runs the same seeded simulation, crowded enough for sheep to
+    share, wolves to eat and both to reproduce, with move costs and natural
+    deaths, and its agents and environment are compared with those of the
+    reference after every iteration. The kernels of the numba backend are
+    also run as plain Python, as numba-py, so that they are checked even
+    where Numba is not installed.
+
+    Returns:
+        List of messages describing each failure
+    """
+    case = {"sheep": 400, "wolves": 40, "neighbourhood": 4, "grid": 40}
+    names = backends.available() + ["numba-py"]
+    models = {}
+    for name in names:
+        if name == "numba-py":
+            model = build(case, seed, "numpy")
+            model.backend = backends.NumbaBackend(jit=False)
+        else:
+            model = build(case, seed, name)
+        model.sheep_move_cost = 0.5
+        model.wolf_move_cost = 0.5
+        model.death_rate = 0.01
+        model.starvation = -20
+        models[name] = model
+    reference = models.pop("python")
+    failures = []
+    for i in range(iterations):
+        reference.step()
+        # A backend is only compared until it first differs
+        for name, model in list(models.items()):
+            model.step()
+            for label, expected, found in (
+                    ("sheep", reference.flock, model.flock),
+                    ("wolves", reference.wolves, model.wolves),
+                    ("environment", reference, model)):
+                if label == "environment":
+                    same = numpy.allclose(expected.environment,
+                                          found.environment)
+                else:
+                    same = (len(expected) == len(found) and
+                            numpy.array_equal(expected.x, found.x) and
+                            numpy.array_equal(expected.y, found.y) and
+                            numpy.allclose(expected.store, found.store) and
+                            numpy.array_equal(expected.fed, found.fed))
+                if not same:
+                    failures.append("Backend {} differs from python in its "
+                                    "{} at iteration {}".format(
+                                        name, label, i + 1))
+                    del models[name]
+                    break
+    for name in names:
+        if name != "python":
+            print("{:<8} {}".format(name, "matches" if name in models
+                                    else "differs"))
+    return failures
+
+
+def check_tracking(iterations=20, seed=0):
+    """Checks that the running sums and changed cells kept by the tracker of
+    a simulation agree with the environment itself.
+
+    A seeded simulation is run without regrowth and then with it. After every
+    iteration the total and tile sums are compared with sums of the whole
+    environment, and a copy of the environment updated only at the cells
+    reported as changed is compared with the environment.
+
+    Returns:
+        List of messages describing each failure
+    """
+    model = build({"sheep": 2000, "wolves": 50, "neighbourhood": 3,
+                   "grid": 150}, seed)
+    tracker = model.tracker
+    tracker.take_dirty()
+    copy = numpy.array(model.environment)
+    failures = []
+    for i in range(iterations):
+        if i == iterations // 2:
+            model.regrowth = 0.05
+            model.capacity = 250
+        model.step()
+        fresh = tracking.Tracker(model.environment, tracker.tile)
+        if not numpy.isclose(tracker.total, fresh.total):
+            failures.append("Total {} differs from the sum {} at iteration "
+                            "{}".format(tracker.total, fresh.total, i + 1))
+        if not numpy.allclose(tracker.tiles, fresh.tiles):
+            failures.append("Tile sums differ from the environment at "
+                            "iteration {}".format(i + 1))
+        dirty = tracker.take_dirty()
+        if dirty is None:
+            copy[...] = model.environment
+        else:
+            copy.reshape(-1)[dirty] = model.environment.reshape(-1)[dirty]
+        if not numpy.array_equal(copy, model.environment):
+            failures.append("Cells changed without being reported at "
+                            "iteration {}".format(i + 1))
+    print("tracking {}".format("differs" if failures else "matches"))
+    return failures
+
+
+def commit():
+    """Returns the current git commit, or None outside a repository."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], check=True,
+                              capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous, tolerance=1.2, floor=1e-3):
+    """Lists phases that are slower than in a previous results file.
+
+    Args:
+        results: Results of this run
+        previous: Results of an earlier run
+        tolerance: Ratio of new to old time above which a phase is reported
+        floor: Phases quicker than this many seconds are too noisy to report
+
+    Returns:
+        List of (case, phase, old time, new time) tuples
+    """
+    old = {json.dumps(entry["case"], sort_keys=True): entry["timings"]
+           for entry in previous["results"]}
+    slower = []
+    for entry in results["results"]:
+        timings = old.get(json.dumps(entry["case"], sort_keys=True))
+        if timings is None:
+            continue
+        for phase, seconds in entry["timings"].items():
+            if (phase in timings and seconds > floor and
+                    seconds > tolerance * timings[phase]):
+                slower.append((entry["case"], phase, timings[phase], seconds))
+    return slower
+
+
+def main(argv=None):
+    """Runs the benchmark suite from the command line.
+
+    Args:
+        argv: List of command line arguments, defaults to sys.argv
+
+    Returns:
+        Exit status of the program, 1 if a regression was found
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the phases of a population model step.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", default=None,
+                        help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.2)
+    parser.add_argument("--imports", action="store_true",
+                        help="only check the import time of the model")
+    parser.add_argument("--import-budget", type=float, default=0.25,
+                        help="seconds allowed to import a headless module")
+    parser.add_argument("--memory", action="store_true",
+                        help="only check the memory taken per agent")
+    parser.add_argument("--object-budget", type=int, default=160,
+                        help="bytes allowed per framework agent object")
+    parser.add_argument("--array-budget", type=int, default=48,
+                        help="bytes allowed per agent of a population")
+    parser.add_argument("--backends", action="store_true",
+                        help="only check that every backend matches the "
+                             "python reference")
+    parser.add_argument("--tracking", action="store_true",
+                        help="only check the running sums of the environment")
+    parser.add_argument("--backend", default=None,
+                        choices=backends.available(),
+                        help="backend to time, the fastest available by "
+                             "default")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        failures = check_imports(args.import_budget)
+        for failure in failures:
+            print(failure)
+        return 1 if failures else 0
+    if args.memory:
+        failures = check_memory(args.object_budget, args.array_budget)
+        for failure in failures:
+            print(failure)
+        return 1 if failures else 0
+    if args.backends or args.tracking:
+        failures = []
+        if args.backends:
+            failures += check_backends(seed=args.seed)
+        if args.tracking:
+            failures += check_tracking(seed=args.seed)
+        for failure in failures:
+            print(failure)
+        return 1 if failures else 0
+
+    results = {"commit": commit(),
+               "python": platform.python_version(),
+               "numpy": numpy.__version__,
+               "backend": backends.get(args.backend).name,
+               "repeats": args.repeats,
+               "seed": args.seed,
+               "results": []}
+    for case in cases():
+        timings = time_case(case, args.repeats, args.seed, args.backend)
+        results["results"].append({"case": case, "timings": timings})
+        print("sheep={sheep:>6} wolves={wolves:>5} "
+              "neighbourhood={neighbourhood:>3} "
+              "grid={grid:>5}".format(**case) +
+              "".join("  {}={:.4f}s".format(name, seconds)
+                      for name, seconds in timings.items()))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        slower = compare(results, previous, args.tolerance)
+        for case, phase, old, new in slower:
+            print("Slower: {} {} {:.4f}s -> {:.4f}s".format(case, phase, old,
+                                                           new))
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Saves and restores the full state of a simulation.
+
+This script writes checkpoints of a simulation to compact binary .npz files.
+A checkpoint holds the agent arrays, the nibbled environment, the state of the
+random number generator, the iteration reached and the model parameters, so
+that a run resumed from a checkpoint gives exactly the same results as one
+which was never interrupted. The Checkpointer class takes a checkpoint every
+defined number of iterations and writes it from a background thread, so that
+the model does not wait on the disk.
+
+  Typical usage example:
+
+  with Checkpointer("checkpoints", every=100) as checkpointer:
+      simulation.run(10000, callback=checkpointer)
+  simulation = load("checkpoints/checkpoint_000010000.npz")
+"""
+
+# Import required modules
+import json
+import os
+import queue
+import threading
+import numpy
+import framework
+import population
+import simulation
+
+
+def snapshot(model):
+    """Copies the state of a simulation.
+
+    Args:
+        model: Simulation to copy
+
+    Returns:
+        Dictionary of arrays which can be passed to numpy.savez
+    """
+    meta = {"iteration": model.iteration,
+            "neighbourhood": model.neighbourhood,
+            "wolf_threshold": model.wolf_threshold,
+            "sheep_threshold": model.sheep_threshold,
+            "regrowth": model.regrowth,
+            "capacity": model.capacity,
+            "diffusion": model.diffusion,
+            "sheep_move_cost": model.sheep_move_cost,
+            "wolf_move_cost": model.wolf_move_cost,
+            "death_rate": model.death_rate,
+            "starvation": model.starvation,
+            "rng": model.rng.bit_generator.state}
+    state = {"meta": numpy.array(json.dumps(meta)),
+             "environment": numpy.array(model.environment)}
+    for name, agents in (("sheep", model.flock), ("wolves", model.wolves)):
+        state[name + "_x"] = agents.x.copy()
+        state[name + "_y"] = agents.y.copy()
+        state[name + "_store"] = agents.store.copy()
+        state[name + "_fed"] = agents.fed.copy()
+    return state
+
+
+def write(state, path):
+    """Atomically writes a snapshot to a .npz file."""
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        numpy.savez(f, **state)
+    os.replace(temp_path, path)
+
+
+def save(model, path):
+    """Writes a checkpoint of a simulation to path straight away."""
+    write(snapshot(model), path)
+
+
+def load(path):
+    """Restores a simulation from a checkpoint.
+
+    Args:
+        path: Location of the .npz checkpoint
+
+    Returns:
+        A Simulation in exactly the state in which it was saved
+    """
+    with numpy.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        environment = numpy.array(data["environment"])
+        groups = []
+        for name, agent_class in (("sheep", framework.Sheep),
+                                  ("wolves", framework.Wolf)):
+            agents = population.Population(environment, agent_class,
+                                           max(len(data[name + "_x"]), 16))
+            # Checkpoints written before agents were flagged as fed treat
+            # every agent as having eaten, as starvation then assumed
+            fed = (data[name + "_fed"] if name + "_fed" in data.files
+                   else True)
+            agents.extend(data[name + "_x"], data[name + "_y"],
+                          data[name + "_store"], fed)
+            groups.append(agents)
+    model = simulation.Simulation(environment, groups[0], groups[1],
+                                  meta["neighbourhood"],
+                                  meta["wolf_threshold"],
+                                  meta["sheep_threshold"],
+                                  regrowth=meta.get("regrowth", 0.0),
+                                  capacity=meta.get("capacity"),
+                                  diffusion=meta.get("diffusion", 0.0),
+                                  sheep_move_cost=meta.get("sheep_move_cost",
+                                                           0.0),
+                                  wolf_move_cost=meta.get("wolf_move_cost",
+                                                          0.0),
+                                  death_rate=meta.get("death_rate", 0.0),
+                                  starvation=meta.get("starvation", 0.0))
+    model.iteration = meta["iteration"]
+    model.rng.bit_generator.state = meta["rng"]
+    return model
+
+
+def latest(folder):
+    """Returns the location of the newest checkpoint within a folder, or None
+    if there is none."""
+    try:
+        names = sorted(name for name in os.listdir(folder)
+                       if name.startswith("checkpoint_") and
+                       name.endswith(".npz"))
+    except OSError:
+        return None
+    return os.path.join(folder, names[-1]) if names else None
+
+
+class Checkpointer:
+    """Checkpointer class, used to take checkpoints during a run.
+
+    Call the checkpointer with the simulation after every iteration, e.g. by
+    passing it as the callback of Simulation.run. Every defined number of
+    iterations the state is copied and queued, and a background thread writes
+    it to checkpoint_<iteration>.npz within the folder. At most two
+    checkpoints wait to be written at once.
+
+    Attributes:
+        folder: Folder in which checkpoints are written
+        every: Number of iterations between checkpoints
+    """
+
+    def __init__(self, folder, every=100):
+        """Inits Checkpointer with folder and every and starts the writer."""
+        self.folder = folder
+        self.every = every
+        os.makedirs(folder, exist_ok=True)
+        self._queue = queue.Queue(maxsize=2)
+        self._error = None
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def _write(self):
+        """Writes queued checkpoints until None is queued."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            state, path = item
+            try:
+                write(state, path)
+            except Exception as error:
+                # Keep taking checkpoints off the queue, so that the
+                # simulation never blocks, and raise the error from there
+                self._error = error
+
+    def __call__(self, model):
+        """Queues a checkpoint if the simulation has reached one."""
+        if self._error is not None:
+            raise self._error
+        if model.iteration % self.every == 0:
+            path = os.path.join(self.folder, "checkpoint_{:09d}.npz".format(
+                model.iteration))
+            self._queue.put((snapshot(model), path))
+
+    def close(self):
+        """Waits for every queued checkpoint to be written."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
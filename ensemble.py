@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Runs many replicates of the population model together.
+
+This script defines the Ensemble class, which holds a number of independent
+replicates of a model with the same parameters and advances them all at once.
+The environments of the replicates are held along an extra leading dimension
+of a single array, and the agents of every replicate are held within one
+flock and one wolf pack, so that each behaviour is applied to every replicate
+within a single array operation rather than one run at a time.
+
+Within the flock and pack, replicate r lies r strides further down the y
+axis, where a stride is the height of the environment plus a band of empty
+rows wider than the neighbourhood. Agents never cross this band, and the
+band is wider than any distance over which agents interact, so replicates
+never affect each other. Each replicate behaves exactly as a Simulation with
+the same parameters would, and the size of the flock and wolf pack and the
+resource left within each replicate are recorded after every iteration, from
+which the mean and spread of the trajectories are summarised.
+
+  Typical usage example:
+
+  ensemble = Ensemble(20, 5, 20, 1, 100, replicates=100, seed=0)
+  ensemble.run(200)
+  bands = ensemble.summary()
+
+  From the command line:
+
+  python ensemble.py --replicates 100 --iterations 200 --output bands.csv
+"""
+
+# Import required modules
+import argparse
+import csv
+import sys
+import time
+import numpy
+import environment
+import framework
+import population
+import positions
+import scenario
+
+
+# Metrics recorded for every replicate after every iteration
+METRICS = ("sheep", "wolves", "resource")
+
+# Number of cells of the environment regrown at once, so that each chunk of
+# replicates stays within the processor's cache while it is worked on
+CHUNK = 1 << 17
+
+# Statistics of the replicates given for each metric by Ensemble.summary
+STATISTICS = ("mean", "std", "sem", "low", "high")
+
+
+class Ensemble:
+    """Ensemble class, used to run replicates of a model as one batch.
+
+    Attributes:
+        environment: 3-D array holding the environment of each replicate
+                     along its first axis
+        flock: Population containing the sheep of every replicate
+        wolves: Population containing the wolves of every replicate
+        replicates: Number of replicates
+        stride: Distance along the y axis of the flock and wolf pack between
+                the start of one replicate and the start of the next
+        iteration: Number of iterations completed so far
+        rng: numpy.random.Generator driving every random choice of every
+             replicate
+        history: Dictionary mapping each of METRICS to a list holding an
+                 array of the metric for every replicate, one per iteration
+                 starting with the initial state
+
+    The parameters of the model are held as within simulation.Simulation.
+    """
+
+    def __init__(self, num_of_sheep, num_of_wolves, neighbourhood,
+                 wolf_threshold, sheep_threshold, replicates, seed=None,
+                 path="in.txt", regrowth=0.0, capacity=None, diffusion=0.0,
+                 sheep_move_cost=0.0, wolf_move_cost=0.0, death_rate=0.0,
+                 starvation=0.0, environment=None, fetch=None):
+        """Inits Ensemble, placing the agents of every replicate.
+
+        Args:
+            num_of_sheep: Number of sheep in initial iteration of each
+                          replicate
+            num_of_wolves: Number of wolves in initial iteration of each
+                           replicate
+            neighbourhood: range at which sheep can share resources
+            wolf_threshold: Number of sheep needed to be consumed for
+                            wolves to reproduce
+            sheep_threshold: Store size needed for sheep to reproduce
+            replicates: Number of replicates
+            seed: Optional seed for the random number generator
+            path: Location of the .txt file or .npy raster defining the
+                  environment
+            regrowth, capacity, diffusion, sheep_move_cost, wolf_move_cost,
+            death_rate, starvation: As for simulation.Simulation.create
+            environment: Optional 2-D environment already loaded, used in
+                         place of path
+            fetch: Optional positions.PositionFetch already started
+
+        Sheep are placed at the preset starting locations, as within
+        scenario.set_sheep, and any sheep beyond them and every wolf are
+        placed randomly, separately within each replicate.
+        """
+        if fetch is None:
+            fetch = positions.PositionFetch()
+        if environment is None:
+            environment = scenario.create_environment(path)
+        grid = numpy.asarray(environment)
+        height, width = grid.shape
+        self.replicates = replicates
+        self.stride = height + max(neighbourhood, 1) + 1
+        self._height = height
+        self._buffer = numpy.zeros((replicates, self.stride, width),
+                                   dtype=grid.dtype)
+        self._buffer[:, :height] = grid
+        self.environment = self._buffer[:, :height]
+        stacked = self._buffer.reshape(replicates * self.stride, width)
+        self._stacked = stacked
+        # Flags the rows of the stack holding an environment rather than the
+        # band of empty rows below it
+        self._rows = numpy.tile(numpy.arange(self.stride) < height,
+                                replicates)
+        self.neighbourhood = neighbourhood
+        self.wolf_threshold = wolf_threshold
+        self.sheep_threshold = sheep_threshold
+        self.regrowth = regrowth
+        self.diffusion = diffusion
+        if capacity is None and (regrowth or diffusion):
+            capacity = float(grid.max())
+        self.capacity = capacity
+        self.sheep_move_cost = sheep_move_cost
+        self.wolf_move_cost = wolf_move_cost
+        self.death_rate = death_rate
+        self.starvation = starvation
+        self.iteration = 0
+        self.rng = numpy.random.default_rng(seed)
+
+        start_positions = fetch.result()
+        if start_positions is None:
+            scenario.show_error("Information", "Unable to retrieve initial "
+                                "sheep starting locations. Scenario will be "
+                                "initialised with random data")
+            start_positions = ([], [])
+        preset = [(_y, _x) for _y, _x in zip(*start_positions)
+                  if _y < height and _x < width][:num_of_sheep]
+        self.flock = population.Population(
+            stacked, framework.Sheep, max(num_of_sheep * replicates, 16))
+        self.wolves = population.Population(
+            stacked, framework.Wolf, max(num_of_wolves * replicates, 16))
+        for r in range(replicates):
+            ys, xs = self._place(num_of_sheep, preset)
+            self.flock.extend(xs, ys + r * self.stride, numpy.zeros(len(xs)))
+            ys, xs = self._place(num_of_wolves, [])
+            self.wolves.extend(xs, ys + r * self.stride, numpy.zeros(len(xs)))
+        self.history = {name: [] for name in METRICS}
+        self._resource = self.environment.sum(axis=(1, 2),
+                                              dtype=numpy.float64)
+        self._record()
+
+    def _place(self, count, preset):
+        """Returns the y and x coordinates of count agents within a
+        replicate, starting with those of preset and placing the rest
+        randomly."""
+        height, width = self.environment.shape[1:]
+        ys = numpy.empty(count, dtype=numpy.int64)
+        xs = numpy.empty(count, dtype=numpy.int64)
+        if preset:
+            ys[:len(preset)], xs[:len(preset)] = zip(*preset)
+        ys[len(preset):] = self.rng.integers(0, height, count - len(preset))
+        xs[len(preset):] = self.rng.integers(0, width, count - len(preset))
+        return ys, xs
+
+    def replicate(self, agents):
+        """Returns the replicate of every agent of the flock or wolf pack."""
+        return agents.y // self.stride
+
+    def _move(self, agents, cost):
+        """Moves the agents of every replicate as Population.move does,
+        keeping every agent within the environment of its own replicate."""
+        height, width = self.environment.shape[1:]
+        for coords, local, edge in (
+                (agents.y, agents.y % self.stride, height - 1),
+                (agents.x, agents.x, width - 1)):
+            step = numpy.where(self.rng.random(len(agents)) < 0.5, 1, -1)
+            step[local == edge] = -1
+            step[local == 0] = 1
+            coords += step
+        if cost:
+            store = agents.store
+            store -= cost
+        agents.moved()
+
+    def _count(self, agents):
+        """Returns the number of agents within each replicate."""
+        return numpy.bincount(self.replicate(agents),
+                              minlength=self.replicates)
+
+    def _record(self):
+        """Records the metrics of every replicate."""
+        self.history["sheep"].append(self._count(self.flock))
+        self.history["wolves"].append(self._count(self.wolves))
+        self.history["resource"].append(self._resource.copy())
+
+    def step(self):
+        """Advances every replicate by one iteration.
+
+        Each replicate goes through the phases of simulation.Simulation.step
+        in the same order, with every phase applied to all of the replicates
+        at once.
+        """
+        flock = self.flock
+        wolves = self.wolves
+        rng = self.rng
+        for agents in (flock, wolves):
+            agents.shuffle(rng)
+            # Keep each replicate's agents together, in their shuffled order,
+            # so that sharing and predation work on nearby memory
+            agents.reorder(numpy.argsort(self.replicate(agents),
+                                         kind="stable"))
+
+        self._move(flock, self.sheep_move_cost)
+        cells, taken = flock.graze()
+        # Only the grazed cells change, so the resource of each replicate is
+        # kept up to date without summing the whole environment
+        self._resource -= numpy.bincount(
+            cells // (self.stride * self._buffer.shape[2]), weights=taken,
+            minlength=self.replicates)
+        flock.share(self.neighbourhood)
+        flock.reproduce(self.sheep_threshold)
+
+        self._move(wolves, self.wolf_move_cost)
+        eaten = wolves.predate(flock)
+        wolves.reproduce(self.wolf_threshold)
+
+        dead = flock.mortality(rng, self.death_rate, self.starvation)
+        flock.remove(numpy.concatenate((eaten, dead)))
+        wolves.remove(wolves.mortality(rng, self.death_rate,
+                                       self.starvation))
+        flock.apply_births()
+        wolves.apply_births()
+
+        if self.regrowth or self.diffusion:
+            self._regrow()
+        self.iteration += 1
+        self._record()
+
+    def _regrow(self):
+        """Regrows and diffuses the environment of every replicate.
+
+        The contiguous stack of environments is regrown in place a chunk of
+        whole replicates at a time, keeping the bands between them empty.
+        The resource of each replicate is updated from the amount regrown,
+        as diffusion moves resources without changing their total.
+        """
+        rows = self.stride * self._buffer.shape[2]
+        step = max(CHUNK // rows, 1)
+        integer = self._stacked.dtype.kind != "f"
+        for start in range(0, self.replicates, step):
+            stop = min(start + step, self.replicates)
+            block = slice(start * self.stride, stop * self.stride)
+            grown = environment.regrow(self._stacked[block], self.regrowth,
+                                       self.capacity, self.diffusion,
+                                       self.rng, self._rows[block])
+            if integer:
+                self._resource[start:stop] = self.environment[
+                    start:stop].sum(axis=(1, 2), dtype=numpy.float64)
+            elif grown is not None:
+                self._resource[start:stop] += grown.reshape(
+                    stop - start, -1).sum(axis=1, dtype=numpy.float64)
+
+    def run(self, num_of_iterations):
+        """Advances every replicate by a defined number of iterations.
+
+        Returns:
+            The ensemble itself
+        """
+        for i in range(num_of_iterations):
+            self.step()
+        return self
+
+    def trajectories(self):
+        """Returns the recorded metrics.
+
+        Returns:
+            Dictionary mapping each of METRICS to an array with a row for
+            each iteration, starting with the initial state, and a column
+            for each replicate
+        """
+        return {name: numpy.array(values, dtype=numpy.float64)
+                for name, values in self.history.items()}
+
+    def summary(self, confidence=0.95):
+        """Summarises the spread of the replicates after every iteration.
+
+        Args:
+            confidence: Fraction of the replicates lying within the band
+                        given by low and high
+
+        Returns:
+            Dictionary mapping each of METRICS to a dictionary mapping each
+            of STATISTICS to an array with a value for each iteration: the
+            mean across replicates, their standard deviation, the standard
+            error of the mean, and the quantiles of the replicates bounding
+            the central band of confidence
+        """
+        ddof = 1 if self.replicates > 1 else 0
+        summary = {}
+        for name, values in self.trajectories().items():
+            std = values.std(axis=1, ddof=ddof)
+            low, high = numpy.quantile(
+                values, [(1 - confidence) / 2, (1 + confidence) / 2], axis=1)
+            summary[name] = {"mean": values.mean(axis=1), "std": std,
+                             "sem": std / numpy.sqrt(self.replicates),
+                             "low": low, "high": high}
+        return summary
+
+
+def write_csv(summary, output):
+    """Writes a summary, as returned by Ensemble.summary, to a .csv file
+    with one row per iteration."""
+    columns = ["{}_{}".format(name, statistic) for name in METRICS
+               for statistic in STATISTICS]
+    length = len(summary[METRICS[0]]["mean"])
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["iteration"] + columns)
+        for i in range(length):
+            writer.writerow([i] + [summary[name][statistic][i]
+                                   for name in METRICS
+                                   for statistic in STATISTICS])
+
+
+def main(argv=None):
+    """Runs an ensemble from the command line.
+
+    Reports the mean and spread of the final population sizes and the speed
+    of the run, and optionally writes the summary of every iteration to a
+    .csv file.
+
+    Args:
+        argv: List of command line arguments, defaults to sys.argv
+
+    Returns:
+        Exit status of the program
+    """
+    parser = argparse.ArgumentParser(
+        description="Run many replicates of the population model at once.")
+    parser.add_argument("--replicates", type=int, default=100)
+    parser.add_argument("--sheep", type=int, default=20)
+    parser.add_argument("--wolves", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--neighbourhood", type=int, default=20)
+    parser.add_argument("--wolf-threshold", type=int, default=1)
+    parser.add_argument("--sheep-threshold", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--environment", default="in.txt")
+    parser.add_argument("--regrowth", type=float, default=0.0)
+    parser.add_argument("--capacity", type=float, default=None)
+    parser.add_argument("--diffusion", type=float, default=0.0)
+    parser.add_argument("--sheep-move-cost", type=float, default=0.0)
+    parser.add_argument("--wolf-move-cost", type=float, default=0.0)
+    parser.add_argument("--death-rate", type=float, default=0.0)
+    parser.add_argument("--starvation", type=float, default=0.0)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--output", default=None,
+                        help=".csv file to which the summary of every "
+                             "iteration is written")
+    args = parser.parse_args(argv)
+    for name, value in (("regrowth", args.regrowth),
+                        ("diffusion", args.diffusion)):
+        if not 0 <= value <= 1:
+            parser.error("--{} must be between 0 and 1".format(name))
+
+    ensemble = Ensemble(args.sheep, args.wolves, args.neighbourhood,
+                        args.wolf_threshold, args.sheep_threshold,
+                        args.replicates, seed=args.seed,
+                        path=args.environment, regrowth=args.regrowth,
+                        capacity=args.capacity, diffusion=args.diffusion,
+                        sheep_move_cost=args.sheep_move_cost,
+                        wolf_move_cost=args.wolf_move_cost,
+                        death_rate=args.death_rate,
+                        starvation=args.starvation)
+    start = time.perf_counter()
+    ensemble.run(args.iterations)
+    elapsed = time.perf_counter() - start
+    summary = ensemble.summary(args.confidence)
+    print("Replicates: {}".format(ensemble.replicates))
+    print("Iterations: {}".format(ensemble.iteration))
+    for name in ("sheep", "wolves"):
+        final = {statistic: values[-1]
+                 for statistic, values in summary[name].items()}
+        print("{}: {:.1f} +/- {:.1f} ({:.0%} of replicates within "
+              "{:.0f}-{:.0f})".format(name.capitalize(), final["mean"],
+                                      final["std"], args.confidence,
+                                      final["low"], final["high"]))
+    print("Time: {:.3f}s ({:.1f} replicate iterations/s)".format(
+        elapsed, ensemble.replicates * args.iterations / elapsed
+        if elapsed else 0.0))
+    if args.output:
+        write_csv(summary, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Loads the environment in which the agents move and interact.
+
+This script reads the comma separated .txt file defining the environment into a
+2-D NumPy array. Parsing is done a block of lines at a time by the C parser of
+numpy.loadtxt rather than one value at a time in Python. Once a file has been
+parsed, a binary copy of the array is kept alongside it in a sidecar cache, so
+that later runs load the environment without parsing the text again. The cache
+is rebuilt automatically whenever the text file changes.
+
+Environments can be stored with a compact dtype, and can be memory-mapped from
+the cache, or from a .npy raster, rather than read into memory. Cells are
+then only read from disk once agents touch them, and cells which are grazed
+are copied into memory, so the file itself is never changed. This allows
+environments much larger than the available memory.
+
+  Typical usage example:
+
+  environment = load_environment("in.txt")
+  environment = load_environment("raster.npy", mmap=True, dtype="float32")
+"""
+
+# Import required modules
+import hashlib
+import json
+import os
+import numpy
+
+
+# Number of lines parsed at once when converting a .txt file
+BLOCK = 4096
+
+
+def _parse_lines(lines, width, dtype):
+    """Parses a list of comma separated lines into a 2-D array.
+
+    The values are converted by the C parser of numpy.loadtxt, so no Python
+    object is made for any of them. Floating point environments are parsed
+    straight into their own dtype, others are parsed as 64-bit floats and
+    then converted, as they have always been.
+    """
+    parsed = dtype if numpy.dtype(dtype).kind == "f" else numpy.float64
+    try:
+        values = numpy.loadtxt(lines, dtype=parsed, delimiter=",",
+                               comments=None, ndmin=2)
+    except ValueError:
+        # Only look for ragged rows once parsing has failed
+        if any(line.count(",") != width - 1 for line in lines):
+            values = None
+        else:
+            raise
+    if values is None or values.shape[1] != width:
+        raise ValueError("Rows of the environment file are not all the same "
+                         "length")
+    return values.astype(dtype, copy=False)
+
+
+def _blocks(f):
+    """Yields the non-empty lines of a file in lists of up to BLOCK lines."""
+    block = []
+    for line in f:
+        line = line.strip()
+        if line:
+            block.append(line)
+            if len(block) == BLOCK:
+                yield block
+                block = []
+    if block:
+        yield block
+
+
+def _shape(path):
+    """Returns the number of rows and columns of a .txt environment."""
+    height = 0
+    width = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                if width is None:
+                    width = line.count(",") + 1
+                height += 1
+    if width is None:
+        raise ValueError("Environment file '{}' is empty".format(path))
+    return height, width
+
+
+def parse_environment(path, dtype=numpy.float64, out=None):
+    """Parses a comma separated .txt file into a 2-D array.
+
+    Args:
+        path: Location of the .txt file defining the environment
+        dtype: Type of the values of the array
+        out: Optional array, e.g. a memory-mapped file, of the right shape to
+             parse into
+
+    Returns:
+        A contiguous 2-D array with one row per line of the file
+
+    Raises:
+        ValueError: If the rows of the file are not all the same length
+    """
+    if out is None:
+        out = numpy.empty(_shape(path), dtype=dtype)
+    height, width = out.shape
+    row = 0
+    with open(path) as f:
+        for block in _blocks(f):
+            if row + len(block) > height:
+                raise ValueError("Environment file '{}' changed while being "
+                                 "read".format(path))
+            out[row:row + len(block)] = _parse_lines(block, width, out.dtype)
+            row += len(block)
+    return out
+
+
+def file_hash(path):
+    """Returns the SHA-1 hex digest of the contents of a file."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(path, dtype=numpy.float64):
+    """Returns the locations of the cached array and its metadata.
+
+    The 64-bit cache keeps the name it has always had, other dtypes are
+    cached separately so that switching dtype does not rebuild the cache.
+    """
+    dtype = numpy.dtype(dtype)
+    if dtype == numpy.float64:
+        base = path + ".cache"
+    else:
+        base = "{}.{}.cache".format(path, dtype.name)
+    return base + ".npy", base + ".json"
+
+
+def _read_cache(path, stat, dtype, mmap):
+    """Returns the cached array for path, or None if it is out of date.
+
+    The cache is trusted straight away if the size and modification time of
+    the text file match those recorded. If only the modification time differs
+    the file is hashed, and the cache is still used if the contents match.
+    """
+    array_path, meta_path = cache_paths(path, dtype)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["size"] != stat.st_size:
+            return None
+        if meta["mtime_ns"] != stat.st_mtime_ns:
+            if meta["sha1"] != file_hash(path):
+                return None
+            meta["mtime_ns"] = stat.st_mtime_ns
+            _write_json(meta_path, meta)
+        environment = numpy.load(array_path, mmap_mode="c" if mmap else None)
+        if environment.dtype != dtype or environment.ndim != 2:
+            return None
+        return environment
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_json(meta_path, meta):
+    """Atomically writes the metadata of a cache."""
+    temp_path = meta_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(temp_path, meta_path)
+
+
+def _write_cache(path, stat, dtype):
+    """Parses path straight into its cache file.
+
+    The text is parsed a block at a time into a memory-mapped .npy file, so
+    the whole environment is never held in memory at once.
+
+    Returns:
+        True if the cache was written, False if it could not be, e.g. because
+        the folder is read only
+    """
+    array_path, meta_path = cache_paths(path, dtype)
+    temp_path = array_path + ".tmp"
+    out = None
+    try:
+        out = numpy.lib.format.open_memmap(temp_path, mode="w+", dtype=dtype,
+                                           shape=_shape(path))
+        parse_environment(path, out=out)
+        out.flush()
+        out = None
+        os.replace(temp_path, array_path)
+        _write_json(meta_path, {"size": stat.st_size,
+                                "mtime_ns": stat.st_mtime_ns,
+                                "sha1": file_hash(path)})
+        return True
+    except OSError:
+        return False
+    finally:
+        # Never leave a partly written cache behind, whether writing failed
+        # or the text could not be parsed
+        out = None
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+def load_environment(path="in.txt", cache=True, mmap=False,
+                     dtype=numpy.float64):
+    """Loads an environment, using the binary cache when it is up to date.
+
+    Args:
+        path: Location of the .txt file defining the environment, or of a
+              .npy raster
+        cache: If False the text file is always parsed and no cache is kept
+        mmap: If True the environment is memory-mapped copy-on-write from the
+              cache or raster instead of being read into memory
+        dtype: Type of the values of the environment, e.g. "float32" or
+               "uint16" to save space
+
+    Returns:
+        A contiguous 2-D array modelling the environment
+
+    Raises:
+        OSError: If the file can not be read
+        ValueError: If the file is not a grid of numbers
+    """
+    dtype = numpy.dtype(dtype)
+    if path.lower().endswith(".npy"):
+        environment = numpy.load(path, mmap_mode="c" if mmap else None)
+        if environment.ndim != 2:
+            raise ValueError("Raster '{}' is not 2-D".format(path))
+        if environment.dtype != dtype:
+            if mmap:
+                raise ValueError("Raster '{}' holds {} values and can only be "
+                                 "memory-mapped as such".format(
+                                     path, environment.dtype))
+            environment = environment.astype(dtype)
+        return environment
+    stat = os.stat(path)
+    if cache:
+        environment = _read_cache(path, stat, dtype, mmap)
+        if environment is None and _write_cache(path, stat, dtype):
+            environment = _read_cache(path, stat, dtype, mmap)
+        if environment is not None:
+            return environment
+    return parse_environment(path, dtype)
+
+
+def regrow(environment, rate, capacity, diffusion=0.0, rng=None, rows=None):
+    """Regrows and spreads the resources of the whole environment in place.
+
+    Resources first diffuse, with every cell exchanging diffusion / 4 of the
+    difference between itself and each of its four neighbours. Nothing flows
+    over the edges of the domain, so diffusion neither creates nor destroys
+    resources. Every cell below capacity then regrows by rate of the gap
+    between it and capacity. Both are applied to the whole grid as array
+    operations. Environments with an integer dtype are then rounded
+    stochastically, up with a chance equal to the fraction of a unit gained,
+    so that gains of less than half a unit still regrow cells to capacity
+    over time rather than being rounded away.
+
+    Note that regrowth touches every cell, so a memory-mapped environment
+    becomes fully resident once regrowth or diffusion is enabled.
+
+    Args:
+        environment: 2-D array modelling the environment, or a stack of
+                     environments along leading axes, e.g. the replicates of
+                     an ensemble, each of which is regrown separately
+        rate: Fraction, between 0 and 1, of the gap to capacity regrown in
+              one step
+        capacity: Most resources a cell can regrow to
+        diffusion: Fraction, between 0 and 1, of the difference with its
+                   neighbours which a cell exchanges in one step
+        rng: Optional numpy.random.Generator used to round integer
+             environments, a new unseeded generator by default
+        rows: Optional array of one flag per row, along the second last
+              axis, False for rows which are only padding, e.g. between the
+              replicates of an ensemble stacked into one grid. Padding rows
+              neither regrow nor exchange resources with their neighbours.
+
+    Returns:
+        Array of the amount regrown within each cell, before any rounding,
+        or None if rate is 0
+
+    Raises:
+        ValueError: If rate or diffusion is not between 0 and 1
+    """
+    if not 0 <= rate <= 1:
+        raise ValueError("rate must be between 0 and 1")
+    if not 0 <= diffusion <= 1:
+        raise ValueError("diffusion must be between 0 and 1")
+    if environment.dtype.kind == "f":
+        grid = environment
+    else:
+        grid = environment.astype(numpy.float64)
+    if diffusion:
+        change = numpy.zeros(grid.shape, dtype=grid.dtype)
+        for axis in (-2, -1):
+            flow = numpy.diff(grid, axis=axis)
+            if axis == -2:
+                if rows is not None:
+                    flow[..., ~(rows[:-1] & rows[1:]), :] = 0
+                change[..., :-1, :] += flow
+                change[..., 1:, :] -= flow
+            else:
+                change[..., :-1] += flow
+                change[..., 1:] -= flow
+        change *= diffusion / 4
+        grid += change
+    gap = None
+    if rate:
+        gap = capacity - grid
+        numpy.maximum(gap, 0, out=gap)
+        gap *= rate
+        if rows is not None:
+            gap[..., ~rows, :] = 0
+        grid += gap
+    if grid is not environment:
+        if rng is None:
+            rng = numpy.random.default_rng()
+        grid += rng.random(grid.shape)
+        environment[...] = numpy.floor(grid)
+    return gap
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
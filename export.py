@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Exports a run of the population model to a GIF or MP4 file.
+
+This script runs a simulation without a display and hands a snapshot of every
+iteration to a pool of worker processes. Each worker draws snapshots with the
+Agg backend and writes them as numbered PNG frames, so that frames are drawn in
+parallel on every core while the model keeps running. Once the run is finished
+the frames are put together into a GIF with Pillow or an MP4 with ffmpeg.
+
+  Typical usage example:
+
+  export(simulation, "run.gif", 200)
+
+  From the command line:
+
+  python export.py run.gif --iterations 200 --sheep 50 --wolves 10
+"""
+
+# Import required modules
+import argparse
+import concurrent.futures
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import numpy
+import simulation
+
+
+class _Positions:
+    """Coordinates of a group of agents, drawn in place of a Population."""
+
+    def __init__(self, population):
+        self.x = population.x.copy()
+        self.y = population.y.copy()
+
+    def __len__(self):
+        return len(self.x)
+
+
+class Snapshot:
+    """Snapshot class, used to hold a copy of what is drawn for an iteration.
+
+    A snapshot can be drawn by renderer.Renderer in place of a simulation and
+    is cheap to send to a worker process.
+
+    Attributes:
+        environment: Copy of the environment array
+        flock: Coordinates of the sheep
+        wolves: Coordinates of the wolves
+        iteration: Number of iterations completed
+    """
+
+    def __init__(self, model):
+        """Inits Snapshot by copying the state of a simulation."""
+        self.environment = numpy.array(model.environment)
+        self.flock = _Positions(model.flock)
+        self.wolves = _Positions(model.wolves)
+        self.iteration = model.iteration
+
+
+# Renderer reused by every frame drawn within a worker process, and the
+# resolution at which frames are saved
+_renderer = None
+_dpi = 80
+
+
+def _start_worker(dpi):
+    """Switches a worker process to the Agg backend."""
+    global _dpi
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    _dpi = dpi
+
+
+def _draw_frame(snapshot, path):
+    """Draws a snapshot within a worker process and saves it as a PNG."""
+    global _renderer
+    import renderer
+    if _renderer is None:
+        _renderer = renderer.Renderer(snapshot)
+    _renderer.simulation = snapshot
+    _renderer.draw()
+    _renderer.fig.savefig(path, dpi=_dpi)
+    return path
+
+
+def assemble(frames, output, fps):
+    """Puts a list of PNG frames together into a GIF or MP4 file.
+
+    Args:
+        frames: Ordered list of PNG file locations
+        output: Location of the file to write, ending .gif or .mp4
+        fps: Frames per second of the output
+
+    Raises:
+        ValueError: If output is not a .gif or .mp4 file
+        RuntimeError: If ffmpeg is needed and not installed
+    """
+    extension = os.path.splitext(output)[1].lower()
+    if extension == ".gif":
+        from PIL import Image
+        images = [Image.open(frame) for frame in frames]
+        images[0].save(output, save_all=True, append_images=images[1:],
+                       duration=int(1000 / fps), loop=0)
+    elif extension == ".mp4":
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("ffmpeg is needed to write MP4 files")
+        pattern = os.path.join(os.path.dirname(frames[0]), "frame_%06d.png")
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error",
+                        "-framerate", str(fps), "-i", pattern,
+                        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                        "-pix_fmt", "yuv420p", output], check=True)
+    else:
+        raise ValueError("Output must be a .gif or .mp4 file")
+
+
+def export(model, output, num_of_iterations, every=1, processes=None,
+           fps=2, dpi=80):
+    """Runs a simulation and exports it as an animation.
+
+    Args:
+        model: Simulation object to run
+        output: Location of the file to write, ending .gif or .mp4
+        num_of_iterations: Number of iterations to run
+        every: Only every nth iteration is drawn
+        processes: Number of worker processes, defaults to one per core
+        fps: Frames per second of the output
+        dpi: Resolution of each frame
+
+    Returns:
+        Number of frames written
+    """
+    processes = processes or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as folder, \
+            concurrent.futures.ProcessPoolExecutor(
+                processes, initializer=_start_worker,
+                initargs=(dpi,)) as pool:
+        pending = []
+        frames = []
+        for i in range(num_of_iterations):
+            model.step()
+            if (i + 1) % every:
+                continue
+            path = os.path.join(folder, "frame_{:06d}.png".format(len(frames)))
+            frames.append(path)
+            pending.append(pool.submit(_draw_frame, Snapshot(model), path))
+            # Limit the snapshots held in memory if drawing falls behind
+            if len(pending) >= 4 * processes:
+                pending.pop(0).result()
+        for future in pending:
+            future.result()
+        if frames:
+            assemble(frames, output, fps)
+        return len(frames)
+
+
+def main(argv=None):
+    """Exports a run of the population model from the command line.
+
+    Args:
+        argv: List of command line arguments, defaults to sys.argv
+
+    Returns:
+        Exit status of the program
+    """
+    parser = argparse.ArgumentParser(
+        description="Export a run of the population model to GIF or MP4.")
+    parser.add_argument("output", help="file to write, ending .gif or .mp4")
+    parser.add_argument("--sheep", type=int, default=20)
+    parser.add_argument("--wolves", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--neighbourhood", type=int, default=20)
+    parser.add_argument("--wolf-threshold", type=int, default=1)
+    parser.add_argument("--sheep-threshold", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--environment", default="in.txt")
+    parser.add_argument("--every", type=int, default=1,
+                        help="only draw every nth iteration")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--fps", type=float, default=2)
+    parser.add_argument("--dpi", type=int, default=80)
+    args = parser.parse_args(argv)
+    if args.every < 1:
+        parser.error("--every must be at least 1")
+    if args.fps <= 0:
+        parser.error("--fps must be greater than 0")
+
+    model = simulation.Simulation.create(args.sheep, args.wolves,
+                                         args.neighbourhood,
+                                         args.wolf_threshold,
+                                         args.sheep_threshold, seed=args.seed,
+                                         path=args.environment)
+    count = export(model, args.output, args.iterations, every=args.every,
+                   processes=args.processes, fps=args.fps, dpi=args.dpi)
+    print("Wrote {} frames to {}".format(count, args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
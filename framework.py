@@ -15,41 +15,72 @@ examples.
 import random
 
 
+class World:
+    """World class, used to hold the context shared by a group of agents.
+
+    Every agent of a flock or wolf pack refers to the same World rather than
+    holding its own references to the list of agents and the environment.
+
+    Attributes:
+        agents: list of agents
+        enviroment: This list models the enviroment in which agents
+        will be moving and interacting with.
+    """
+    __slots__ = ("agents", "environment")
+
+    def __init__(self, agents, environment):
+        """Inits World with agents and environment."""
+        self.agents = agents
+        self.environment = environment
+
+
 class Agent:
     """Agent class, used to define a generic agent within the model
 
     Agent class, used to define the methods which are common to both the wolves
     and sheep agents. This class is used to initialise these classes and acts
     as a parent class from which methods are inherited. If x and y coordinates 
-    of these agents are null, then these are randomly assigned
+    of these agents are null, then these are randomly assigned. The domain
+    in which agents move is defined by the size of the environment. Agents
+    only hold their coordinates, their store and the World they share with
+    the rest of their group, within slots rather than a __dict__, so that
+    millions of agents fit in memory
 
     Attributes:
-        agents: list of agents
+        world: World shared by every agent of the group
+        agents: list of agents, read from world
         enviroment: This list models the enviroment in which agents 
-        will be moving and interacting with.
+        will be moving and interacting with, read from world
         _y: y coordinate of agent
         _x: x coordinate of agent
         store: represents the amount of "assets" or "food" stored by agent
     """
+    __slots__ = ("x", "y", "store", "world")
 
-    def __init__(self, agents, environment, _y, _x):
-        """Inits Agent with environment, agents, _y and _x."""
+    def __init__(self, world, _y=None, _x=None):
+        """Inits Agent with world, _y and _x."""
     
-        import random
-        # If x null assign random value
+        environment = world.environment
+        # If x null assign random value within the environment
         if (_x == None):
-            self.x = random.randint(0,100)
+            self.x = random.randint(0,len(environment[0]) - 1)
         else:
             self.x = _x
         # If y null assign random value    
         if (_y == None):
-            self.y = random.randint(0,100)
+            self.y = random.randint(0,len(environment) - 1)
         else:
             self.y = _y
-        self.environment = environment
-        self.agents = agents
+        self.world = world
         self.store = 0
 
+    @property
+    def agents(self):
+        return self.world.agents
+
+    @property
+    def environment(self):
+        return self.world.environment
 
 
 
@@ -76,32 +107,31 @@ class Agent:
 #             self.x = (self.x + 1) % 100
 #    else:
 #             self.x = (self.x - 1) % 100
+    # Take the edges of the domain from the size of the environment
+        bottom = len(self.environment) - 1
+        right = len(self.environment[0]) - 1
     # If object is at boundary conditions, move it away from edge             
-        if self.y == 100 or self.y == 0:
-            if self.y == 100:
-                 self.y = (self.y - 1) % 100
-            else:
-                 self.y = (self.y + 1) % 100
+        if self.y == bottom:
+            self.y -= 1
+        elif self.y == 0:
+            self.y += 1
         # Else move object in a random manner
+        elif random.random() < 0.5:
+            self.y += 1
         else:
-            if random.random() < 0.5:
-                 self.y = (self.y + 1) % 100
-            else:
-                 self.y = (self.y - 1) % 100
+            self.y -= 1
                  
                  
         # If object is at boundary conditions, move it away from edge          
-        if self.x == 100 or self.x == 0:
-            if self.y == 100:
-                 self.x = (self.x - 1) % 100
-            else:
-                 self.x = (self.x + 1) % 100
+        if self.x == right:
+            self.x -= 1
+        elif self.x == 0:
+            self.x += 1
         # Else move object in a random manner         
+        elif random.random() < 0.5:
+            self.x += 1
         else:
-            if random.random() < 0.5:
-                 self.x = (self.x + 1) % 100
-            else:
-                 self.x = (self.x - 1) % 100
+            self.x -= 1
                  
              
         
@@ -116,6 +146,7 @@ class Sheep(Agent):
     agents are inherited within this class.
 
     Attributes (Inherited from Class Agent)
+        world: World shared by every agent of the flock
         agents: list of agents
         enviroment: This list models the enviroment in which agents 
         will be moving and interacting with.
@@ -123,9 +154,11 @@ class Sheep(Agent):
         _x: x coordinate of agent
         store: represents the amount of "assets" or "food" stored by agent
     """
-    def __init__(self, agents, environment, _y, _x):
+    __slots__ = ()
+
+    def __init__(self, world, _y=None, _x=None):
         # Inherit all attributes defined within class Agent  
-        Agent.__init__(self, agents, environment, _y, _x) 
+        Agent.__init__(self, world, _y, _x) 
 
  
 
@@ -137,7 +170,7 @@ class Sheep(Agent):
             self.environment[self.y][self.x] -= 10
             self.store += 10
       else:
-            self.store = self.environment[self.y][self.x]
+            self.store += self.environment[self.y][self.x]
             self.environment[self.y][self.x]=0
     
 
@@ -150,12 +183,20 @@ class Sheep(Agent):
              Neighbourhood: Constant defining the distance at which sheep agents can
                             share resources
          """  
-         for agent in self.agents:  
-             # Calculate the distance between sheep and all other sheep in 
-             # flock
-             dist = self.distance_between(agent)
+         # Only compare sheep from nearby cells if the flock keeps a spatial
+         # index, otherwise compare against every sheep in the flock
+         neighbours = getattr(self.agents, "neighbours", None)
+         if neighbours is None:
+             agents = self.agents
+         else:
+             agents = neighbours(self.x, self.y, neighbourhood)
+         limit = neighbourhood * neighbourhood
+         for agent in agents:  
+             # Calculate the squared distance between sheep and the other 
+             # sheep in flock
+             dist = self.squared_distance_between(agent)
              #If this distance is less than user defined distance, share stores
-             if dist <= neighbourhood:
+             if dist <= limit:
                  sum = self.store + agent.store
                  ave = sum /2
                  self.store = ave
@@ -170,6 +211,11 @@ class Sheep(Agent):
          distance""" 
          return (((self.x - agent.x)**2) + ((self.y - agent.y)**2))**0.5
 
+    def squared_distance_between(self, agent):
+         """Calculates the squared euclidean distance between two agents, 
+         which avoids a square root when comparing distances"""
+         return ((self.x - agent.x)**2) + ((self.y - agent.y)**2)
+
     def reproduce(self, sheep_threshold):
           """If sheep store is greater or equal to the reproduction threshold
           append a copy of the agent to the flock and reset stores to 0
@@ -178,7 +224,7 @@ class Sheep(Agent):
               sheep_threshold: Store size needed for sheep to reproduce""" 
           if self.store >= sheep_threshold:
              self.store = 0
-             self.agents.append(Sheep(self.agents,self.environment, self.y, self.x))
+             self.agents.append(Sheep(self.world, self.y, self.x))
      
 
 class Wolf(Agent):
@@ -189,6 +235,7 @@ class Wolf(Agent):
     agents are inherited within this class.
 
     Attributes (Inherited from Class Agent)
+        world: World shared by every agent of the wolf pack
         agents: list of agents
         enviroment: This list models the enviroment in which agents 
         will be moving and interacting with.
@@ -196,9 +243,11 @@ class Wolf(Agent):
         _x: x coordinate of agent
         store: represents the amount of "assets" or "food" stored by agent
     """
-    def __init__(self, agents, environment, _y, _x):
+    __slots__ = ()
+
+    def __init__(self, world, _y=None, _x=None):
     # Inherit all attributes defined within class Agent:
-        Agent.__init__(self, agents, environment, _y, _x)
+        Agent.__init__(self, world, _y, _x)
     
         
     def distance_between(self, agent, x, y):
@@ -207,29 +256,41 @@ class Wolf(Agent):
         return (((self.x - x)**2) + ((self.y - y)**2))**0.5
      
     
-    def eat(self, Sheep):
+    def eat(self, Sheep, claimed=None):
         """Allows wolfs to consume sheep agents that are adjacent to themselves.
          
         Args: 
              Sheep: List of sheep agents
+             claimed: Optional set of indices of sheep already eaten by other
+                      wolves this iteration. These sheep are skipped and the
+                      index of the sheep eaten is added to the set.
              
         Returns:
              i = index of sheep which have been consumed
           
         """
-        # Extract x,y coords from sheep list
-        for i in range(len(Sheep)):
+        if claimed is None:
+            claimed = set()
+        # Only look at sheep in the cells around the wolf if the flock keeps a
+        # spatial index, otherwise look at every sheep within flock
+        neighbours = getattr(Sheep, "neighbours", None)
+        if neighbours is None:
+            candidates = range(len(Sheep))
+        else:
+            candidates = [agent.index for agent in neighbours(self.x, self.y, 1)]
+        for i in candidates:
+            if i in claimed:
+                continue
+            # Extract x,y coords from sheep list
             x = Sheep[i].x
             y = Sheep[i].y
-            # Calculate distance of wolf to every sheep within flock
-            for agent in self.agents:
-             dist = self.distance_between(agent, x, y)    
-             # If sheep is adjacent to wolf, return it index and increase wolf
-             # store by 1
-             if dist <= (2)**0.5:
-                 self.store += 1
-                 return i
-                 break
+            # If sheep is adjacent to wolf, return it index and increase wolf
+            # store by 1
+            dist = self.distance_between(self, x, y)
+            if dist <= (2)**0.5:
+                self.store += 1
+                claimed.add(i)
+                return i
              
     def reproduce(self, wolf_threshold):
           """If wolf store is greater or equal to the reproduction threshold
@@ -239,8 +300,7 @@ class Wolf(Agent):
              wolf_threshold: Store size needed for sheep to reproduce"""    
           if self.store >= wolf_threshold:
               self.store = 0
-              self.agents.append(Wolf(self.agents,self.environment, 
-                                      self.y, self.x))
+              self.agents.append(Wolf(self.world, self.y, self.x))
 
 __author__ = "Michael Gibson"
 __copyright__ = "Copyright 201i, Michael Gibson"
@@ -5,24 +5,45 @@
 
 This script constructs a User Interface from which a population model is run.
 The GUI contains two menus: model and help. This GUI allows users to change
-the initial conditions of the model and calls the script MainCode from which
-contains the code by which the model is actually run.
+the initial conditions of the model. The model itself is run by a
+worker.SimulationWorker within a background process, and the GUI draws the
+newest snapshot it has published at its own frame rate, so that the window
+stays responsive however slow each iteration is.
 
   Typical usage example:
 
   launch_GUI
+
+  or from the command line, with the iterations run per second uncapped:
+
+  python gui.py --rate 0
 """
 
+import argparse
 import matplotlib
 matplotlib.use('TkAgg')
 import matplotlib.pyplot
-import maincode
+import renderer
+import telemetry
+import time
 import tkinter as tk
+import worker
 from tkinter import messagebox
 
 
+# Milliseconds between the frames drawn by the GUI
+FRAME_INTERVAL = 100
+
+# Greatest number of iterations run per second by default, so that a run can
+# be followed by eye. Frames are drawn every FRAME_INTERVAL whatever the rate.
+ITERATIONS_PER_SECOND = 2
+
+# Worker running the current model, if any
+model_worker = None
+
+
     
-def launch_gui():
+def launch_gui(rate=ITERATIONS_PER_SECOND):
     """Launches master GUI window from which the Population Model can be run.
  
     Launces a GUI in which the user can edit the initial conditions of the
@@ -30,7 +51,8 @@ def launch_gui():
     the spatial behaviour of the agents (wolves and sheep) can be observed.
 
     Args:
-        N/A
+        rate: Greatest number of iterations run per second, None or 0 to run
+              them as fast as possible
 
     Returns:
         A fully formed GUI with the following menus available for the user to
@@ -45,6 +67,10 @@ def launch_gui():
                 neighbourhood and num_of_wolves, wolf_threshold and 
                 sheep_threshold can all be redefined.
                 
+                Show Performance - When ticked, the time spent within each
+                phase of an iteration and the iterations run per second are
+                shown within a status bar along the bottom of the window.
+                
                 Exit - Closes model window
                 
                 
@@ -67,6 +93,7 @@ def launch_gui():
     global canvas
     global wolf_threshold 
     global sheep_threshold
+    global show_performance
   
     
 
@@ -83,6 +110,9 @@ def launch_gui():
     fig = matplotlib.pyplot.figure()
     root = tk.Tk()
     root.wm_title("Model")
+    show_performance = tk.BooleanVar(master=root, value=False)
+    status_bar = tk.Label(root, text="", anchor=tk.W, relief=tk.SUNKEN)
+    status_bar.pack(side=tk.BOTTOM, fill=tk.X)
     canvas = (matplotlib.backends.backend_tkagg.
               FigureCanvasTkAgg(fig, master=root))
     canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
@@ -95,13 +125,14 @@ def launch_gui():
     #Add Model menu to the GUI with the commands Run, SetParameters and Exit
     menu_bar.add_cascade(label="Model", menu=model_menu)
     (model_menu.add_command(label="Run model", command = lambda: 
-        maincode.run(num_of_sheep, num_of_wolves, num_of_iterations, 
-                             neighbourhood, fig, wolf_threshold, 
-                             sheep_threshold)))
+        run_model(fig, status_bar, rate)))
     (model_menu.add_command(label="Set Parameters", 
                             command = lambda: set_parameters()))
+    (model_menu.add_checkbutton(label="Show Performance",
+                                variable = show_performance))
     model_menu.add_separator()
-    model_menu.add_command(label="Exit", command= lambda: root.destroy())
+    model_menu.add_command(label="Exit", command= lambda: close(root))
+    root.protocol("WM_DELETE_WINDOW", lambda: close(root))
     
     
     #Add help menu with the commands help and about   
@@ -113,6 +144,64 @@ def launch_gui():
     tk.mainloop()
 
 
+def run_model(fig, status_bar, rate=ITERATIONS_PER_SECOND):
+    """Runs the population model using the parameters currently defined.
+
+    Any run already in progress is stopped. The model is started within a
+    background worker and the newest snapshot it has published is drawn every
+    FRAME_INTERVAL milliseconds, dropping any snapshots published in between.
+    If Show Performance is ticked, a profiler is attached to the run and the
+    metrics of the iteration drawn are written to the status bar.
+
+    Args:
+        fig: Figure in which the model is drawn
+        status_bar: Label along the bottom of the main GUI window
+        rate: Greatest number of iterations run per second, None or 0 to run
+              them as fast as possible. Only the model is held back, frames
+              are drawn every FRAME_INTERVAL milliseconds either way.
+    """
+    global model_worker
+    if model_worker is not None:
+        model_worker.stop()
+    status_bar.config(text="")
+    profile = show_performance.get()
+    model_worker = worker.SimulationWorker(
+        (num_of_sheep, num_of_wolves, neighbourhood, wolf_threshold,
+         sheep_threshold), num_of_iterations, rate=rate,
+        profile=profile)
+    view = None
+
+    def draw_latest(current):
+        """Draws the newest snapshot and schedules the next frame."""
+        nonlocal view
+        # Stop drawing once a newer run has been started
+        if current is not model_worker:
+            return
+        latest = current.latest()
+        if latest is not None:
+            snapshot, metrics = latest
+            start = time.perf_counter()
+            if view is None:
+                view = renderer.Renderer(snapshot, fig)
+            view.simulation = snapshot
+            view.draw()
+            fig.canvas.draw_idle()
+            if profile and metrics is not None:
+                metrics["phases"]["render"] = time.perf_counter() - start
+                status_bar.config(text=telemetry.format_status(metrics))
+        if not current.finished:
+            status_bar.after(FRAME_INTERVAL, draw_latest, current)
+
+    draw_latest(model_worker)
+
+
+def close(root):
+    """Stops any run in progress and closes the main GUI window."""
+    if model_worker is not None:
+        model_worker.stop()
+    root.destroy()
+
+
 def set_parameters():
     """Creates a GUI in which users can redefine initial model conditions.
 
@@ -264,7 +353,15 @@ def show_help_info():
 
 if __name__ == "__main__":
     #If main program launch GUI and wait for user interaction
-    launch_gui()
+    parser = argparse.ArgumentParser(
+        description="Launch the GUI of the population model.")
+    parser.add_argument("--rate", type=float, default=ITERATIONS_PER_SECOND,
+                        help="greatest number of iterations run per second, "
+                             "0 for as fast as possible")
+    args = parser.parse_args()
+    if args.rate < 0:
+        parser.error("--rate must be at least 0")
+    launch_gui(args.rate)
     
 __author__ = "Michael Gibson"
 __copyright__ = "Copyright 201i, Michael Gibson"
@@ -17,234 +17,91 @@ GUI
   the code defined within the fuction if __name__ == "__main__":
 """
 
-# Import required modules
-import matplotlib
-matplotlib.use('TkAgg')
-import random
-import matplotlib.pyplot
-import matplotlib.animation 
-import framework
-import requests
-import bs4
-from tkinter import messagebox
+# Import required modules. Matplotlib and tkinter are slow to import and are
+# only imported once a figure or message box is needed, so that the model can
+# be used without them, for example within worker processes.
+import simulation
 import sys
+import time
+# The scenario is set up within scenario, whose functions remain available
+# from here for existing callers
+from scenario import create_environment, set_sheep, set_wolves, show_error
 
 
 #Set intial values for the model
 
 
-def create_environment():
-    """Creates an environment for agents to inhabit and interact with.
-
-    Retrieves csv data from a defined .txt file from the document repository. 
-    This data is constructed into a list of lists which matches the dimensions
-    defined by the csv file. If this file is not found in the correct directory
-    the user is informed and the program terminated
-
-    Args:
-        in.txt - .txt file defining the enviroment and its values
+def use_matplotlib():
+    """Imports matplotlib on first use, selecting the TkAgg backend unless
+    a backend has already been chosen by importing pyplot.
 
     Returns:
-        Enivironment - A list of lists that represents the enivironment in 
-        which agents are to move around.
-
-    Raises:
-        Prints an error in the console asking the user to place in.txt file in 
-        the correct directory and terminates program
+        The matplotlib module, with pyplot and animation imported
     """
-    try:
-        # Define initial list
-        environment = []
-        # Attempt to open .csv file
-        f = open("in.txt")
-        #Create enivronment
-        for line in f:
-            parsed_line = str.split(line,",")
-            rowlist = []
-            for word in parsed_line:
-                rowlist.append(float(word))
-            environment.append(rowlist)
-        f.close()
-        return environment
-    except:
-        # If error returned, inform user and state that the file is not in the 
-        # specified location
-        messagebox.showerror("Error", "File 'in.txt' not found in specified directory. Please ensure this file is in the correct location and rerun this scenario")
-        # End program
-        sys.exit()    
-
-
-def set_sheep(environment, num_of_sheep):
-    """Creates a list of sheep agents.
-
-    Webscrapes preset online data in order to define the starting location of
-    the sheep agents. If a web connection is not present, these starting 
-    locations are randomly placed using the class method of the sheep class object
-
-    Args:
-        enviroment: This list models the enviroment in which sheep agents 
-        will be moving and interacting with.
-        num_of_sheep: This variable outlines how many sheep agents are to be 
-        created within this function.
-        
+    import matplotlib
+    if "matplotlib.pyplot" not in sys.modules:
+        matplotlib.use('TkAgg')
+    import matplotlib.pyplot
+    import matplotlib.animation
+    return matplotlib
 
-    Returns:
-        flock: A list containing a defined amount of sheep
-    
-     Raises:
-        Prints message box if program is unable to access the URL which defines
-        the initial starting coordinates of the sheep
-    """           
-    #Initialise flock list
-    flock = []    
-    try: 
-        # Access HTML of website
-        r = requests.get('http://www.geog.leeds.ac.uk/courses/computing/practicals/python/agent-framework/part9/data.html')
-        content = r.text
-        soup = bs4.BeautifulSoup(content, 'html.parser')
-        # Search HTML for y and x tags and pass these values into a list
-        td_ys = soup.find_all(attrs={"class" : "y"})
-        td_xs = soup.find_all(attrs={"class" : "x"})
-    
-        # Create and return a list of sheep agents: flock
-        for i in range(num_of_sheep):
-            _y = int(td_ys[i].text)
-            _x = int(td_xs[i].text)
-            flock.append(framework.Sheep(flock,environment, _y, _x))
-        return flock
-    
-    except:
-        # If defined URL is not available, warn user
-        messagebox.showerror("Information", "Unable to retrieve initial sheep starting locations. Scenario will be initialised with random data")
-        # Create and return a list of sheep agents: flock
-        for i in range(num_of_sheep):
-            _y = None
-            _x = None
-            flock.append(framework.Sheep(flock,environment, _y, _x))
-        return flock
 
+def update(frame_number, simulation, renderer):
+    #print(frame_number) Internal checks
+    """Advances the model by one iteration and draws the result.
 
-def set_wolves(environment, num_of_wolves):
-    """Generate a list of wolf agents.
+    This function advances the simulation by one iteration, in which the agents
+    move randomly across the enivironment domain, reproduce, share resources
+    and the wolf agents predate on sheep that lie one square over. The
+    renderer then updates the agents and heatmap of the enviroment drawn
+    within its figure.
 
-    Generates a list of wolf agents. These agents are to be randomly placed
-    around the domain of the environment using the class methods defined within
-    the wolf object class. 
-    
     Args:
-        enviroment: This list models the enviroment in which wolf agents 
-        will be moving and interacting with.
-        
-        num_of_sheep: This variable outlines how many wolf agents are to be 
-        created within this function.
+        Frame_Number: The iteration of the animation
+        Simulation: Simulation object holding the agents and environment
+        Renderer: Renderer object drawing the simulation
 
     Returns:
-        wolves: A list of wolf agents
+        List of the artists which have been updated, used for blitting
 
     Raises:
         Null
     """
-    # Initialise wolfpack list  
-    wolves = []
-    # Loop around the number of wolves to be defined and append this to list
-    for i in range(num_of_wolves):
-        #  Wolves are to be placed randomly. Set x,y values to null in order to let
-        #  these values be randomly defined within the Agent class.   
-        _y = None
-        _x = None
-        # Append wolves to list
-        wolves.append(framework.Wolf(wolves,environment, _y, _x))
-    return wolves
 
-	
-def update(frame_number, wolves, flock, neighbourhood, fig, wolf_threshold, sheep_threshold):
-    #print(frame_number) Internal checks
-    """Moves agents around the environment domain and allows agents to interact
-    .
+    # print(frame_number) internal check to view if framenumber is as expected
+    simulation.step()
+    # print(len(simulation.flock)) Internal check - to see if flock is size
+    # expected
+    profiler = simulation.profiler
+    if profiler is None:
+        return renderer.draw(frame_number)
+    start = time.perf_counter()
+    artists = renderer.draw(frame_number)
+    profiler.record("render", time.perf_counter() - start)
+    return artists
+
 
-    This function allows the agents to move randomly across the enivironment 
-    domain. As these agents move they reproduce and share resources. 
-    In addition, the wolf agents predate on sheep that lie one square over. 
-    This behaviour is defined from class methods imported from the framework 
-    script
+def animate(model, num_of_iterations, fig=None):
+    """Animates a simulation within a figure.
 
     Args:
-        Frame_Number: The iteration of the animation
-        Wolves: List containing wolf agents
-        Flock: List containing sheep agents
-        Neighbourhood: Constant defining the distance at which sheep agents can
-        share resources
-        wolf_threshold: Number of sheep needed to be consumed for 
-                        wolves to reproduce
-        sheep_threshold: Store size needed for sheep to reproduce
-        
+        model: Simulation object to be advanced and drawn
+        num_of_iterations: number of moves allowed from each agent
+        fig: Figure in which to draw, a new figure is created if not given
 
     Returns:
-        Fig: A scatter plot of the agents location overlayed onto a heatmap
-        of the enviroment at a defined frame number
-
-    Raises:
-        Null
+        Figure in which the simulation is animated
     """
-
-    # print(frame_number) internal check to view if framenumber is as expected
-    # Randomly shuffle agents
-    random.shuffle(flock)
-    random.shuffle(wolves)
-    fig.clear()
-    matplotlib.pyplot.xlim(0, 100)
-    matplotlib.pyplot.ylim(0, 100)
-
-    # print(len(flock)) Internal check - to see if flock is size expected
-    
-    # Loop through all sheep in the flock
-    for i in range(len(flock)): 
-       flock[i].move()
-       flock[i].eat()
-       flock[i].share_with_neighbours(neighbourhood)
-       flock[i].reproduce(sheep_threshold)
-       num_of_sheep = len(flock)
-       sheep_plot = matplotlib.pyplot.scatter(flock[i].x, flock[i].y, c = 'white') 
-    
-    #Return the updated environment which has been nibbled by the sheep
-    environment = flock[0].environment           
-    
-    # Define a blank list, this list will be appended with indices of the sheep 
-    # that have been consumed by wolves and hence must be removed from the flock list
-    sheep_to_remove = []
-    
-    # Loop through all the wolves in the pack
-    for j in range(len(wolves)):       
-       wolves[j].move() 
-       # Find index of sheep adjacent to wolves, append this to list
-       x = wolves[j].eat(flock)
-       if x is not None:   
-           sheep_to_remove.append(x)
-       wolf_plot = matplotlib.pyplot.scatter(wolves[j].x, wolves[j].y, c = 'black')
-       num_of_wolves = len(wolves)
-       wolves[j].reproduce(wolf_threshold) 
-       
-    # Remove sheep that have fallen foul to wolves from flock list   
-    if len(sheep_to_remove) >= 1:
-        #For loop works in reverse order to avoid index ambuiguity.
-        for k in sorted(sheep_to_remove, reverse= True):
-            del flock[k]
-    matplotlib.pyplot.imshow(environment, cmap = 'RdYlGn')
-    scale_bar = matplotlib.pyplot.colorbar()
-    scale_bar.set_label('Resources Available',fontsize= 12,rotation =90)
-    #Set up chart title and legends
-    matplotlib.pyplot.title('Wolves/Sheep Population Model: Iteration {}'.format(frame_number+1),fontsize= 20)
-    matplotlib.pyplot.legend((sheep_plot, wolf_plot),
-           ('Sheep: {}'.format(num_of_sheep), 'Wolves: {}'.format(num_of_wolves)),
-           scatterpoints=1,
-           bbox_to_anchor=(1,0), loc="lower right",
-           ncol=3,
-           fontsize=12)
-    #fig.legend()
-#    ax.legend(loc='upper center', bbox_to_anchor=(0.5, 1.00), shadow=True, ncol=2)
+    global animation
+    matplotlib = use_matplotlib()
+    import renderer
+    view = renderer.Renderer(model, fig)
+    # Set animation going
+    animation = matplotlib.animation.FuncAnimation(view.fig, update, interval=500, repeat=False, frames=num_of_iterations, fargs = (model, view), init_func = view.draw, blit = view.blit)
+    return view.fig
 
 
-def run(num_of_sheep, num_of_wolves, num_of_iterations, neighbourhood, fig, wolf_threshold, sheep_threshold):
+def run(num_of_sheep, num_of_wolves, num_of_iterations, neighbourhood, fig, wolf_threshold, sheep_threshold, profiler=None):
     """Function which runs the actual population model.
 
     Calling this function runs the population model. This function sets up the 
@@ -260,6 +117,8 @@ def run(num_of_sheep, num_of_wolves, num_of_iterations, neighbourhood, fig, wolf
        wolf_threshold: Number of sheep needed to be consumed for 
                         wolves to reproduce
        sheep_threshold: Store size needed for sheep to reproduce
+       profiler: Optional telemetry.Profiler recording the time spent within
+                 each phase of every iteration
 
     Returns:
         Animation of the resulting matplotpy graphs in the GUI of the population
@@ -268,16 +127,11 @@ def run(num_of_sheep, num_of_wolves, num_of_iterations, neighbourhood, fig, wolf
         N/A.
     """   
     
-    global animation
-    environment = create_environment()
-    # Create sheep agents
-    flock = set_sheep(environment, num_of_sheep)
-    # Create wolf agents
-    wolves = set_wolves(environment,num_of_wolves)      
-    fig = matplotlib.pyplot.figure(figsize=(10, 10))
-    # Set animation going
-    animation = matplotlib.animation.FuncAnimation(fig, update, interval=500, repeat=False, frames=num_of_iterations, fargs = (wolves, flock, neighbourhood, fig, wolf_threshold, sheep_threshold))
-    return fig
+    model = simulation.Simulation.create(num_of_sheep, num_of_wolves,
+                                         neighbourhood, wolf_threshold,
+                                         sheep_threshold)
+    model.profiler = profiler
+    return animate(model, num_of_iterations)
 
 
 if __name__ == "__main__":
@@ -287,14 +141,11 @@ if __name__ == "__main__":
     num_of_iterations = 20
     neighbourhood = 20
     num_of_wolves = 20
-    fig = matplotlib.pyplot.figure(figsize=(10, 10))
-    environment = create_environment()
-    #Create sheep agents
-    flock = set_sheep(environment, num_of_sheep)
-    #Create wolf agents
-    wolves = set_wolves(environment,num_of_wolves)      
-    fig = matplotlib.pyplot.figure(figsize=(10, 10))
-    animation = matplotlib.animation.FuncAnimation(fig, update, interval=500, repeat=False, frames=num_of_iterations, fargs = (wolves, flock, neighbourhood, fig))
+    wolf_threshold = 1
+    sheep_threshold = 100
+    run(num_of_sheep, num_of_wolves, num_of_iterations, neighbourhood, None,
+        wolf_threshold, sheep_threshold)
+    use_matplotlib().pyplot.show()
 
     
 __author__ = "Michael Gibson"
@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Runs a single simulation of the population model in several processes.
+
+This script defines the ParallelSimulation class. The environment is split
+into horizontal strips, each owned by a worker process along with the agents
+lying within it, and the environment itself is placed in shared memory so
+that it can be read by the coordinating process without being copied. The
+coordinating process only starts each iteration and collects the counts of
+every strip. Strips hand agents which leave them, the sheep and wolves near
+their edges and the rows either side of them directly to the strips above
+and below, so that every strip works at once.
+
+Sheep sharing and wolf predation reach over the edges of a strip, so each is
+run in two phases. First every strip lets the agents out of reach of its
+neighbours act, then the agents within reach of each edge act together with
+those just beyond it, within the strip above the edge, which is lent the
+sheep and wolves near the top of the strip below. Strips are at least four
+neighbourhoods high, so the agents taking part at different edges never
+meet. Every iteration is therefore equivalent to a single process iteration
+in which the sheep and wolves away from the edges act before those near
+them. A run is repeatable for a given seed and number of strips, but does
+not give the same results as a single process run, whose agents act in a
+different order.
+
+  Typical usage example:
+
+  model = simulation.Simulation.create(10000, 500, 5, 1, 100, seed=0)
+  with ParallelSimulation(model, processes=4) as parallel_model:
+      parallel_model.run(1000)
+"""
+
+# Import required modules
+import multiprocessing
+import multiprocessing.connection
+import os
+import traceback
+from multiprocessing import shared_memory
+import numpy
+import environment
+import framework
+import population
+
+
+# Parameters of a simulation used by every strip
+PARAMETERS = ("neighbourhood", "wolf_threshold", "sheep_threshold",
+              "regrowth", "capacity", "diffusion", "sheep_move_cost",
+              "wolf_move_cost", "death_rate", "starvation")
+
+
+def _pack(agents, indices):
+    """Returns copies of the x, y, store and fed flag of some agents."""
+    return (agents.x[indices].copy(), agents.y[indices].copy(),
+            agents.store[indices].copy(), agents.fed[indices].copy())
+
+
+class _Strip:
+    """Strip of the environment and its agents, held by a worker process.
+
+    Each neighbouring strip is reached through a link, a pair of queues of
+    the messages sent to it and received from it. Both strips of a link send
+    and receive their messages in the same order within every iteration.
+    """
+
+    def __init__(self, top, bottom, memory, shape, dtype, parameters, sheep,
+                 wolves, seed, above=None, below=None):
+        """Inits the strip of rows top to bottom, attaching to the shared
+        environment."""
+        self._memory = shared_memory.SharedMemory(name=memory)
+        self.environment = numpy.ndarray(shape, dtype=dtype,
+                                         buffer=self._memory.buf)
+        self.top = top
+        self.bottom = bottom
+        self.parameters = parameters
+        self.above = above
+        self.below = below
+        self.flock = population.Population(self.environment, framework.Sheep,
+                                           max(len(sheep[0]), 16))
+        self.flock.extend(*sheep)
+        self.wolves = population.Population(self.environment, framework.Wolf,
+                                            max(len(wolves[0]), 16))
+        self.wolves.extend(*wolves)
+        self.rng = numpy.random.default_rng(seed)
+
+    @staticmethod
+    def _send(link, message):
+        """Sends a message to the strip at the other end of link, if any."""
+        if link is not None:
+            link[0].put(message)
+
+    @staticmethod
+    def _receive(link):
+        """Waits for the next message from the strip at the other end of
+        link."""
+        return link[1].get()
+
+    def _inside(self, agents, reach):
+        """Returns whether each agent lies beyond reach of the edges the
+        strip shares with a neighbour."""
+        inside = numpy.ones(len(agents), dtype=bool)
+        if self.above is not None:
+            inside &= agents.y >= self.top + reach
+        if self.below is not None:
+            inside &= agents.y < self.bottom - reach
+        return inside
+
+    def _edge(self, agent_class, *groups):
+        """Returns a population of the groups of agents, each given by its x,
+        y and, optionally, store, in order."""
+        size = sum(len(group[0]) for group in groups)
+        agents = population.Population(self.environment, agent_class,
+                                       max(size, 16))
+        for group in groups:
+            x, y = group[:2]
+            agents.extend(x, y, group[2] if len(group) > 2 else 0)
+        return agents
+
+    def _migrate(self):
+        """Hands the agents which have left the strip to its neighbours and
+        takes in those which have moved into it."""
+        leaving = []
+        for agents in (self.flock, self.wolves):
+            up = numpy.flatnonzero(agents.y < self.top)
+            down = numpy.flatnonzero(agents.y >= self.bottom)
+            leaving.append((_pack(agents, up), _pack(agents, down)))
+            agents.remove(numpy.concatenate((up, down)))
+        self._send(self.above, (leaving[0][0], leaving[1][0]))
+        self._send(self.below, (leaving[0][1], leaving[1][1]))
+        for link in (self.above, self.below):
+            if link is not None:
+                sheep, wolves = self._receive(link)
+                self.flock.extend(*sheep)
+                self.wolves.extend(*wolves)
+
+    def _share(self):
+        """Lets the flock share, first the sheep out of reach of the
+        neighbouring strips, then those near the bottom edge along with the
+        sheep lent by the strip below."""
+        flock = self.flock
+        reach = self.parameters["neighbourhood"]
+        flock.share(reach, numpy.flatnonzero(self._inside(flock, reach)))
+        if self.above is not None:
+            lent = numpy.flatnonzero(flock.y < self.top + 2 * reach)
+            self._send(self.above, (flock.x[lent].copy(),
+                                    flock.y[lent].copy(),
+                                    flock.store[lent].copy()))
+        if self.below is not None:
+            # Only the sheep near the edge are indexed again to share across
+            # it, rather than the whole flock
+            near = numpy.flatnonzero(flock.y >= self.bottom - 2 * reach)
+            x, y, store = self._receive(self.below)
+            edge = self._edge(framework.Sheep, (flock.x[near], flock.y[near],
+                                                flock.store[near]),
+                              (x, y, store))
+            count = len(near)
+            edge.share(reach, numpy.concatenate((
+                numpy.flatnonzero(edge.y[:count] >= self.bottom - reach),
+                count + numpy.flatnonzero(y < self.bottom + reach))))
+            flock.store[near] = edge.store[:count]
+            self._send(self.below, edge.store[count:].copy())
+        if self.above is not None:
+            flock.store[lent] = self._receive(self.above)
+
+    def _hunt(self):
+        """Lets the wolves eat, first those out of reach of the neighbouring
+        strips, then those near the bottom edge along with the wolves lent
+        by the strip below.
+
+        Returns:
+            Array of the indices of the sheep of the strip which were eaten
+        """
+        flock = self.flock
+        wolves = self.wolves
+        eaten = wolves.predate(
+            flock, hunters=numpy.flatnonzero(self._inside(wolves, 1)))
+        left = numpy.ones(len(flock), dtype=bool)
+        left[eaten] = False
+        if self.above is not None:
+            offered = numpy.flatnonzero(left & (flock.y < self.top + 2))
+            lent = numpy.flatnonzero(wolves.y < self.top + 1)
+            self._send(self.above, (
+                (flock.x[offered].copy(), flock.y[offered].copy()),
+                (wolves.x[lent].copy(), wolves.y[lent].copy())))
+        if self.below is not None:
+            near = numpy.flatnonzero(left & (flock.y >= self.bottom - 2))
+            hunters = numpy.flatnonzero(wolves.y >= self.bottom - 1)
+            sheep, pack = self._receive(self.below)
+            prey = self._edge(framework.Sheep, (flock.x[near], flock.y[near]),
+                              sheep)
+            pack = self._edge(framework.Wolf,
+                              (wolves.x[hunters], wolves.y[hunters]), pack)
+            kills = pack.predate(prey)
+            mine = kills < len(near)
+            eaten = numpy.concatenate((eaten, near[kills[mine]]))
+            fed = hunters[pack.fed[:len(hunters)]]
+            wolves.store[fed] += 1
+            wolves.fed[fed] = True
+            self._send(self.below, (kills[~mine] - len(near),
+                                    pack.fed[len(hunters):].copy()))
+        if self.above is not None:
+            kills, fed = self._receive(self.above)
+            eaten = numpy.concatenate((eaten, offered[kills]))
+            wolves.store[lent[fed]] += 1
+            wolves.fed[lent[fed]] = True
+        return eaten
+
+    def _regrow(self):
+        """Regrows and diffuses the rows of the strip, diffusing with copies
+        of the rows either side of it as they were before any strip
+        regrew."""
+        parameters = self.parameters
+        regrowth = parameters["regrowth"]
+        diffusion = parameters["diffusion"]
+        rows = self.environment[self.top:self.bottom]
+        if diffusion:
+            self._send(self.above, numpy.array(rows[:1]))
+            self._send(self.below, numpy.array(rows[-1:]))
+            block = [rows]
+            if self.above is not None:
+                block.insert(0, self._receive(self.above))
+            if self.below is not None:
+                block.append(self._receive(self.below))
+            block = numpy.concatenate(block)
+            environment.regrow(block, regrowth, parameters["capacity"],
+                               diffusion, self.rng)
+            start = 0 if self.above is None else 1
+            rows[...] = block[start:start + len(rows)]
+        elif regrowth:
+            environment.regrow(rows, regrowth, parameters["capacity"],
+                               rng=self.rng)
+
+    def step(self):
+        """Advances the strip by one iteration, in step with its neighbours.
+
+        Returns:
+            Tuple of the numbers of sheep born, wolves born, sheep eaten,
+            sheep and wolves which starved or died naturally, sheep and
+            wolves within the strip, followed by the total store of the
+            sheep and the total resource of the strip
+        """
+        parameters = self.parameters
+        rng = self.rng
+        flock = self.flock
+        wolves = self.wolves
+        flock.shuffle(rng)
+        wolves.shuffle(rng)
+        flock.move(rng, parameters["sheep_move_cost"])
+        wolves.move(rng, parameters["wolf_move_cost"])
+        self._migrate()
+        flock.graze()
+        self._share()
+        sheep_births = flock.reproduce(parameters["sheep_threshold"])
+        eaten = self._hunt()
+        wolf_births = wolves.reproduce(parameters["wolf_threshold"])
+        dead = flock.mortality(rng, parameters["death_rate"],
+                               parameters["starvation"])
+        sheep_deaths = len(numpy.setdiff1d(dead, eaten))
+        flock.remove(numpy.concatenate((eaten, dead)))
+        dead = wolves.mortality(rng, parameters["death_rate"],
+                                parameters["starvation"])
+        wolves.remove(dead)
+        flock.apply_births()
+        wolves.apply_births()
+        self._regrow()
+        return (sheep_births, wolf_births, len(eaten), sheep_deaths,
+                len(dead), len(flock), len(wolves),
+                float(flock.store.sum()),
+                float(self.environment[self.top:self.bottom].sum(
+                    dtype=numpy.float64)))
+
+    def gather(self):
+        """Returns copies of the x, y, store and fed flag of the sheep and
+        wolves."""
+        return (_pack(self.flock, slice(None)),
+                _pack(self.wolves, slice(None)))
+
+    def close(self):
+        """Detaches from the shared environment."""
+        for link in (self.above, self.below):
+            if link is not None:
+                # Messages left unread must not keep the worker from exiting
+                link[0].cancel_join_thread()
+        self.environment = None
+        self.flock = None
+        self.wolves = None
+        self._memory.close()
+
+
+def _serve(connection, arguments):
+    """Runs the commands sent to a strip until None is sent."""
+    strip = _Strip(**arguments)
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                return
+            try:
+                connection.send((True, getattr(strip, message)()))
+            except Exception:
+                connection.send((False, traceback.format_exc()))
+    finally:
+        strip.close()
+
+
+class ParallelSimulation:
+    """ParallelSimulation class, used to run one simulation in strips.
+
+    Built from a Simulation, which it takes the environment, agents and
+    parameters of. It is advanced with step and run in the same way as a
+    Simulation, and should be closed, e.g. by using it as a context manager,
+    so that its worker processes exit and its shared memory is released.
+    The flock and wolves are gathered from the strips when read, which
+    copies every agent, so callbacks run after every iteration should use
+    census instead.
+
+    Attributes:
+        environment: 2-D array modelling the environment, in shared memory
+        strips: List of the (top, bottom) rows of each strip
+        iteration: Number of iterations completed so far
+        sheep_births: Number of sheep born within the last iteration
+        wolf_births: Number of wolves born within the last iteration
+        kills: Number of sheep eaten within the last iteration
+        sheep_deaths: Number of sheep which starved or died naturally within
+                      the last iteration
+        wolf_deaths: Number of wolves which starved or died naturally within
+                     the last iteration
+        census: Tuple of the number of sheep, the number of wolves, the
+                total store of the sheep and the total resource of the
+                environment, summed from the counts of every strip
+    """
+
+    def __init__(self, model, processes=None):
+        """Inits ParallelSimulation from a simulation and starts a worker
+        for each strip.
+
+        Args:
+            model: Simulation to take the environment, agents and parameters
+                   from. Its random number generator seeds the strips.
+            processes: Greatest number of strips, the number of cores by
+                       default. Fewer strips are used if the environment is
+                       too small for each to be at least four times the
+                       neighbourhood high.
+        """
+        height = model.environment.shape[0]
+        processes = processes or os.cpu_count() or 1
+        count = max(min(processes,
+                        int(height // max(4 * model.neighbourhood, 4))), 1)
+        rows = numpy.linspace(0, height, count + 1).astype(int).tolist()
+        self.strips = list(zip(rows[:-1], rows[1:]))
+        for name in PARAMETERS:
+            setattr(self, name, getattr(model, name))
+        self.iteration = model.iteration
+        self.sheep_births = 0
+        self.wolf_births = 0
+        self.kills = 0
+        self.sheep_deaths = 0
+        self.wolf_deaths = 0
+        self.census = (len(model.flock), len(model.wolves),
+                       float(model.flock.store.sum()),
+                       float(model.environment.sum(dtype=numpy.float64)))
+        self._gathered = None
+        self._broken = False
+        self._memory = shared_memory.SharedMemory(
+            create=True, size=max(model.environment.nbytes, 1))
+        self.environment = numpy.ndarray(model.environment.shape,
+                                         dtype=model.environment.dtype,
+                                         buffer=self._memory.buf)
+        self.environment[...] = model.environment
+        parameters = {name: getattr(model, name) for name in PARAMETERS}
+        seeds = numpy.random.SeedSequence(
+            int(model.rng.integers(2 ** 63))).spawn(count)
+        context = multiprocessing.get_context("spawn")
+        self._connections = []
+        self._processes = []
+        self._links = []
+        try:
+            self._start(context, model, parameters, seeds)
+        except BaseException:
+            self._release()
+            raise
+
+    def _start(self, context, model, parameters, seeds):
+        """Starts a worker for each strip, holding the agents within it, and
+        links each strip to the strips above and below it."""
+        # The queues are kept until the workers stop, as a worker can only
+        # attach to a queue while this process still holds it
+        links = [(context.Queue(), context.Queue())
+                 for k in range(len(self.strips) - 1)]
+        self._links.extend(links)
+        for k, ((top, bottom), seed) in enumerate(zip(self.strips, seeds)):
+            inside = []
+            for agents in (model.flock, model.wolves):
+                indices = numpy.flatnonzero((agents.y >= top) &
+                                            (agents.y < bottom))
+                inside.append(_pack(agents, indices))
+            arguments = {"top": top, "bottom": bottom,
+                         "memory": self._memory.name,
+                         "shape": self.environment.shape,
+                         "dtype": self.environment.dtype.str,
+                         "parameters": parameters, "sheep": inside[0],
+                         "wolves": inside[1], "seed": seed,
+                         # Each link sends down its first queue and up its
+                         # second
+                         "above": (links[k - 1][1], links[k - 1][0])
+                         if k > 0 else None,
+                         "below": links[k] if k < len(links) else None}
+            ours, theirs = context.Pipe()
+            process = context.Process(target=_serve, args=(theirs, arguments),
+                                      daemon=True)
+            process.start()
+            self._connections.append(ours)
+            self._processes.append(process)
+
+    def _call(self, command):
+        """Runs a command on every strip at once.
+
+        Results are taken as the strips finish, so that a strip which fails
+        is noticed even while the others wait on it.
+
+        Args:
+            command: Name of the _Strip method to call
+
+        Returns:
+            List of the result of each strip
+
+        Raises:
+            RuntimeError: If the command fails within any strip
+        """
+        if self._broken:
+            raise RuntimeError("A strip has failed, so the simulation can no "
+                               "longer be run")
+        try:
+            for connection in self._connections:
+                connection.send(command)
+            waiting = {connection: k
+                       for k, connection in enumerate(self._connections)}
+            results = [None] * len(self._connections)
+            while waiting:
+                for connection in multiprocessing.connection.wait(
+                        list(waiting)):
+                    k = waiting.pop(connection)
+                    ok, result = connection.recv()
+                    if not ok:
+                        raise RuntimeError("Strip {} failed to {}:\n{}".format(
+                            k, command, result))
+                    results[k] = result
+        except BaseException:
+            # Strips waiting on a neighbour which failed never answer
+            self._broken = True
+            raise
+        return results
+
+    def step(self):
+        """Advances the model by one iteration.
+
+        Every strip advances by one iteration at once, exchanging agents and
+        rows with its neighbours as it goes, and the counts of every strip
+        are summed.
+        """
+        counts = [sum(column) for column in zip(*self._call("step"))]
+        (self.sheep_births, self.wolf_births, self.kills, self.sheep_deaths,
+         self.wolf_deaths) = counts[:5]
+        self.census = tuple(counts[5:])
+        self.iteration += 1
+        self._gathered = None
+
+    def run(self, num_of_iterations, callback=None):
+        """Advances the model by a defined number of iterations.
+
+        Args:
+            num_of_iterations: Number of iterations to run
+            callback: Optional function called with the simulation after
+                      every iteration
+
+        Returns:
+            The simulation itself
+        """
+        for i in range(num_of_iterations):
+            self.step()
+            if callback is not None:
+                callback(self)
+        return self
+
+    def _gather(self):
+        """Collects the agents of every strip into two populations."""
+        if self._gathered is None:
+            gathered = self._call("gather")
+            groups = []
+            for group, agent_class in ((0, framework.Sheep),
+                                       (1, framework.Wolf)):
+                agents = population.Population(self.environment, agent_class)
+                for k in range(len(self.strips)):
+                    agents.extend(*gathered[k][group])
+                groups.append(agents)
+            self._gathered = tuple(groups)
+        return self._gathered
+
+    @property
+    def flock(self):
+        """Population of every sheep, gathered from the strips."""
+        return self._gather()[0]
+
+    @property
+    def wolves(self):
+        """Population of every wolf, gathered from the strips."""
+        return self._gather()[1]
+
+    def close(self):
+        """Stops the worker processes and releases the shared memory."""
+        if self._memory is None:
+            return
+        try:
+            # A strip which has died can not hand back its agents, but the
+            # other workers must still be stopped and the memory released
+            self._gather()
+        except (OSError, EOFError, RuntimeError):
+            self._gathered = None
+            self._broken = True
+        finally:
+            self._release()
+
+    def _release(self):
+        """Stops every worker started and releases the shared memory."""
+        for connection, process in zip(self._connections, self._processes):
+            if not self._broken:
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass
+                process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            connection.close()
+        for link in self._links:
+            for channel in link:
+                channel.close()
+        self._links = []
+        # Gathered agents keep working on a private copy of the environment
+        self.environment = numpy.array(self.environment)
+        for agents in self._gathered or ():
+            agents.environment = self.environment
+            agents.world.environment = self.environment
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,598 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Array backed populations of sheep and wolf agents.
+
+This script defines the Population class, which stores the x and y
+coordinates, stores and alive flags of a whole flock or wolf pack within
+contiguous NumPy arrays. Behaviours such as moving and grazing are applied to
+every agent at once rather than one Python object at a time. Individual agents
+can still be accessed as Sheep or Wolf objects through a view layer, so the
+methods defined within framework continue to work on a population.
+
+  Typical usage example:
+
+  flock = Population.from_agents(scenario.set_sheep(environment, 20),
+                                 environment, framework.Sheep)
+  flock.move(rng)
+  flock.graze()
+  flock[0].store
+"""
+
+# Import required modules
+import numpy
+import framework
+import spatial
+
+
+class _AgentView:
+    """Mixin which redirects the attributes of an agent to a population.
+
+    A view holds a population and an index into it. Reading or writing the x,
+    y or store of the view reads or writes the arrays of the population. Views
+    are only valid until the population is next shuffled or agents removed.
+
+    Attributes:
+        population: Population which the agent belongs to
+        index: Position of the agent within the population arrays
+    """
+
+    def __init__(self, population, index):
+        """Inits the view with population and index."""
+        self.population = population
+        self.index = index
+
+    @property
+    def x(self):
+        return int(self.population.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.population.x[self.index] = value
+        self.population.moved()
+
+    @property
+    def y(self):
+        return int(self.population.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.population.y[self.index] = value
+        self.population.moved()
+
+    @property
+    def store(self):
+        return float(self.population.store[self.index])
+
+    @store.setter
+    def store(self, value):
+        self.population.store[self.index] = value
+
+    @property
+    def world(self):
+        return self.population.world
+
+
+class SheepView(_AgentView, framework.Sheep):
+    """Sheep object backed by the arrays of a Population."""
+
+
+class WolfView(_AgentView, framework.Wolf):
+    """Wolf object backed by the arrays of a Population."""
+
+
+_VIEWS = {framework.Sheep: SheepView, framework.Wolf: WolfView}
+
+
+def _is_number(text):
+    """Returns True if text can be read as a number."""
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _columns(data, names):
+    """Maps column names to the columns of a 2-D array."""
+    if data.ndim != 2 or data.shape[1] > len(names):
+        raise ValueError("Expected at most {} columns".format(len(names)))
+    return {name: data[:, i] for i, name in enumerate(names[:data.shape[1]])}
+
+
+# Names of the arrays holding the agents of a population
+_ARRAYS = ("_x", "_y", "_store", "_alive", "_fed")
+
+
+class Population:
+    """Population class, used to store a group of agents as arrays.
+
+    Stores a flock or wolf pack as a struct of arrays. Space is reserved ahead
+    of time so that agents can be appended cheaply as the population grows
+    through reproduction.
+
+    Attributes:
+        environment: 2-D array modelling the enviroment in which agents
+        will be moving and interacting with.
+        agent_class: framework.Sheep or framework.Wolf
+        world: framework.World shared by the views of this population, with
+               the population itself as its agents
+        x: Array of x coordinates
+        y: Array of y coordinates
+        store: Array of agent stores
+        alive: Array of flags, False for agents waiting to be removed
+        fed: Array of flags, True for agents which have eaten since they
+             were placed or born
+        pending: Number of agents born within this step which have not yet
+                 been added by apply_births
+    """
+
+    def __init__(self, environment, agent_class, capacity=16):
+        """Inits an empty Population with environment and agent_class."""
+        self.environment = environment
+        self.agent_class = agent_class
+        self.world = framework.World(self, environment)
+        self._view = _VIEWS[agent_class]
+        self._n = 0
+        self._x = numpy.zeros(capacity, dtype=numpy.int64)
+        self._y = numpy.zeros(capacity, dtype=numpy.int64)
+        self._store = numpy.zeros(capacity, dtype=numpy.float64)
+        self._alive = numpy.zeros(capacity, dtype=bool)
+        self._fed = numpy.zeros(capacity, dtype=bool)
+        self._cells = {}
+        self._births = []
+
+    @classmethod
+    def from_agents(cls, agents, environment, agent_class):
+        """Builds a population from a list of Sheep or Wolf objects.
+
+        Args:
+            agents: List of agents, such as that returned by set_sheep
+            environment: 2-D array modelling the enviroment
+            agent_class: framework.Sheep or framework.Wolf
+
+        Returns:
+            A Population holding a copy of the agents
+        """
+        population = cls(environment, agent_class, max(len(agents), 16))
+        population.extend([agent.x for agent in agents],
+                          [agent.y for agent in agents],
+                          [agent.store for agent in agents])
+        return population
+
+    @classmethod
+    def load(cls, path, environment, agent_class):
+        """Builds a population from a .csv or .npy file in a single pass.
+
+        A .csv file holds one agent per row with the columns x, y and
+        optionally store, and may start with a header row naming them in any
+        order. A .npy file holds either a 2-D array with the same columns or
+        a structured array with fields named x, y and optionally store.
+        Agents without a store start with an empty store.
+
+        Args:
+            path: Location of the .csv or .npy file
+            environment: 2-D array modelling the enviroment
+            agent_class: framework.Sheep or framework.Wolf
+
+        Returns:
+            A Population holding every agent within the file
+
+        Raises:
+            ValueError: If the file is malformed or places agents outside the
+            domain
+        """
+        if path.lower().endswith(".npy"):
+            data = numpy.load(path)
+            if data.dtype.names is not None:
+                columns = {name: data[name] for name in data.dtype.names}
+            else:
+                columns = _columns(numpy.atleast_2d(data), ("x", "y", "store"))
+        else:
+            with open(path) as f:
+                first = f.readline()
+            names = [name.strip().lower() for name in first.split(",")]
+            header = not _is_number(names[0])
+            data = numpy.loadtxt(path, delimiter=",", ndmin=2,
+                                 skiprows=1 if header else 0)
+            columns = _columns(data, names if header else ("x", "y", "store"))
+        if "x" not in columns or "y" not in columns:
+            raise ValueError(
+                "File '{}' must hold x and y columns".format(path))
+        x = numpy.asarray(columns["x"])
+        y = numpy.asarray(columns["y"])
+        store = numpy.asarray(columns.get("store", numpy.zeros(len(x))))
+        height, width = environment.shape
+        for coords, size in ((x, width), (y, height)):
+            if (len(coords) and (numpy.any(coords != numpy.round(coords)) or
+                                 coords.min() < 0 or coords.max() >= size)):
+                raise ValueError("File '{}' places agents outside the "
+                                 "domain".format(path))
+        population = cls(environment, agent_class, max(len(x), 16))
+        population.extend(x, y, store)
+        return population
+
+    @property
+    def x(self):
+        return self._x[:self._n]
+
+    @property
+    def y(self):
+        return self._y[:self._n]
+
+    @property
+    def store(self):
+        return self._store[:self._n]
+
+    @property
+    def alive(self):
+        return self._alive[:self._n]
+
+    @property
+    def fed(self):
+        return self._fed[:self._n]
+
+    @property
+    def pending(self):
+        return sum(len(x) for x, y in self._births)
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index):
+        """Returns a Sheep or Wolf view of the agent at index."""
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("population index out of range")
+        return self._view(self, index)
+
+    def __iter__(self):
+        for index in range(self._n):
+            yield self._view(self, index)
+
+    def moved(self):
+        """Marks the spatial indexes as out of date after agents move."""
+        self._cells = {}
+
+    def cell_list(self, cell_size):
+        """Returns a spatial.CellList of the agents, rebuilt when out of date.
+
+        Args:
+            cell_size: Width and height of the cells of the index
+        """
+        cell_size = max(int(numpy.ceil(cell_size)), 1)
+        cells = self._cells.get(cell_size)
+        if cells is None:
+            cells = spatial.CellList(self.x, self.y, cell_size)
+            self._cells[cell_size] = cells
+        return cells
+
+    def neighbours(self, x, y, radius):
+        """Returns views of the agents which may lie within radius of x, y.
+
+        Agents are returned in population order. Some agents lying slightly
+        further than radius away may be included.
+        """
+        view = self._view
+        return [view(self, j)
+                for j in self.cell_list(radius).near(x, y, radius)]
+
+    def _reserve(self, size):
+        """Grows the arrays so that they hold at least size agents."""
+        capacity = len(self._x)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in _ARRAYS:
+            old = getattr(self, name)
+            new = numpy.zeros(capacity, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def extend(self, x, y, store, fed=False):
+        """Appends agents to the end of the population.
+
+        Args:
+            x: Sequence of x coordinates
+            y: Sequence of y coordinates
+            store: Sequence of initial stores
+            fed: Flag or sequence of flags, True for agents which have
+                 already eaten
+        """
+        count = len(x)
+        start = self._n
+        self._reserve(start + count)
+        self._x[start:start + count] = x
+        self._y[start:start + count] = y
+        self._store[start:start + count] = store
+        self._alive[start:start + count] = True
+        self._fed[start:start + count] = fed
+        self._n += count
+        self._cells = {}
+
+    def append(self, agent):
+        """Appends a Sheep or Wolf object to the end of the population."""
+        self.extend([agent.x], [agent.y], [agent.store])
+
+    def remove(self, indices):
+        """Removes the agents at the given indices.
+
+        The holes left by removed agents are filled with the surviving agents
+        from the end of the population, so removing agents costs time in
+        proportion to the number removed rather than to the size of the
+        population. The order of the agents which remain is not kept.
+
+        Args:
+            indices: Sequence of indices, duplicates are ignored
+        """
+        if len(indices) == 0:
+            return
+        dead = numpy.unique(numpy.asarray(indices, dtype=numpy.int64))
+        count = self._n - len(dead)
+        holes = dead[dead < count]
+        # Survivors beyond the new end of the population fill the holes
+        tail = numpy.ones(self._n - count, dtype=bool)
+        tail[dead[dead >= count] - count] = False
+        survivors = numpy.flatnonzero(tail) + count
+        for name in _ARRAYS:
+            array = getattr(self, name)
+            array[holes] = array[survivors]
+        self._n = count
+        self._cells = {}
+
+    def compact(self):
+        """Drops every agent whose alive flag is False."""
+        keep = self.alive.copy()
+        count = int(numpy.count_nonzero(keep))
+        if count == self._n:
+            return
+        for name in _ARRAYS:
+            array = getattr(self, name)
+            array[:count] = array[:self._n][keep]
+        self._n = count
+        self._cells = {}
+
+    def shuffle(self, rng):
+        """Randomly reorders the agents.
+
+        Args:
+            rng: numpy.random.Generator used to draw the new order
+        """
+        self.reorder(rng.permutation(self._n))
+
+    def reorder(self, order):
+        """Puts the agents into a new order.
+
+        Args:
+            order: Array of every agent index, in the new order
+        """
+        for name in _ARRAYS:
+            array = getattr(self, name)
+            array[:self._n] = array[:self._n][order]
+        self._cells = {}
+
+    def move(self, rng, cost=0.0):
+        """Randomly moves every agent one step vertically and horizontally.
+
+        Applies the rule defined within framework.Agent.move to every agent at
+        once. Agents at the edge of the domain, defined by the size of the
+        environment, are moved away from it and all other agents move up or
+        down, and left or right, with equal chance. Each move takes cost from
+        the store of the agent, which may leave the store below 0.
+
+        Args:
+            rng: numpy.random.Generator used to draw the moves
+            cost: Energy taken from the store of every agent that moves
+        """
+        height, width = self.environment.shape
+        for coords, edge in ((self.y, height - 1), (self.x, width - 1)):
+            step = numpy.where(rng.random(self._n) < 0.5, 1, -1)
+            step[coords == edge] = -1
+            step[coords == 0] = 1
+            coords += step
+        if cost:
+            store = self.store
+            store -= cost
+        self._cells = {}
+
+    def graze(self, amount=10):
+        """Lets every sheep nibble the environment at its location.
+
+        Each sheep takes up to amount units from its cell and places them
+        within its store. Sheep that share a cell eat in population order, so
+        later sheep only get what the earlier ones have left, exactly as if
+        framework.Sheep.eat had been called on each of them in turn.
+
+        Args:
+            amount: Units consumed by a sheep in one bite
+
+        Returns:
+            Tuple of the flat indices of the cells grazed, one per sheep, and
+            the amount each sheep took from its cell
+        """
+        if self._n == 0:
+            return (numpy.empty(0, dtype=numpy.int64),
+                    numpy.empty(0, dtype=self.environment.dtype))
+        environment = self.environment
+        width = environment.shape[1]
+        cells = self.y * width + self.x
+        # Rank every sheep among the sheep sharing its cell, keeping
+        # population order within each cell
+        order = numpy.argsort(cells, kind="stable")
+        ordered = cells[order]
+        first = numpy.ones(self._n, dtype=bool)
+        first[1:] = ordered[1:] != ordered[:-1]
+        positions = numpy.arange(self._n)
+        starts = numpy.maximum.accumulate(numpy.where(first, positions, 0))
+        rank = numpy.empty(self._n, dtype=numpy.int64)
+        rank[order] = positions - starts
+        # Sheep take a full bite while enough is left, then whatever remains
+        flat = environment.reshape(-1)
+        available = flat[cells] - amount * rank
+        taken = numpy.clip(available, 0, amount)
+        store = self.store
+        store += taken
+        self.fed[taken > 0] = True
+        taken = taken.astype(flat.dtype)
+        numpy.subtract.at(flat, cells, taken)
+        return cells, taken
+
+    def share(self, neighbourhood, visitors=None):
+        """Lets every sheep share its store with the sheep around it.
+
+        Sheep are visited in population order and average their store with
+        every sheep lying within neighbourhood of them, as in
+        framework.Sheep.share_with_neighbours. Only sheep in the cells of the
+        spatial index surrounding each sheep are compared.
+
+        Args:
+            neighbourhood: Constant defining the distance at which sheep agents
+                           can share resources
+            visitors: Optional indices of the sheep which visit the others,
+                      in the order they do so, every sheep by default. Other
+                      sheep are only shared with, e.g. copies of sheep held
+                      by another process.
+        """
+        cells = self.cell_list(neighbourhood)
+        xs = self.x.tolist()
+        ys = self.y.tolist()
+        stores = self.store.tolist()
+        limit = neighbourhood * neighbourhood
+        if visitors is None:
+            visitors = range(self._n)
+        else:
+            visitors = numpy.asarray(visitors, dtype=numpy.int64).tolist()
+        for i in visitors:
+            x = xs[i]
+            y = ys[i]
+            for j in cells.near(x, y, neighbourhood):
+                dx = x - xs[j]
+                dy = y - ys[j]
+                if dx * dx + dy * dy <= limit:
+                    ave = (stores[i] + stores[j]) / 2
+                    stores[i] = ave
+                    stores[j] = ave
+        self.store[:] = stores
+
+    def predate(self, prey, claimed=(), hunters=None):
+        """Lets every wolf eat one sheep lying adjacent to it.
+
+        Wolves are visited in population order and each eats the first sheep,
+        in flock order, lying within one square of it that no other wolf has
+        already eaten. Only the 3x3 block of cells of the flock occupancy index
+        around each wolf is searched. Eaten sheep are not removed from prey,
+        so that the caller can remove them all at once.
+
+        Args:
+            prey: Population of sheep
+            claimed: Optional indices of sheep already eaten, which are
+                     skipped
+            hunters: Optional indices of the wolves which hunt, in the order
+                     they do so, every wolf by default
+
+        Returns:
+            Array of the indices of the sheep which have been eaten
+        """
+        cells = prey.cell_list(1)
+        claimed = set(numpy.asarray(claimed, dtype=numpy.int64).tolist())
+        if hunters is None:
+            hunters = range(self._n)
+        else:
+            hunters = numpy.asarray(hunters, dtype=numpy.int64).tolist()
+        xs = self.x.tolist()
+        ys = self.y.tolist()
+        eaten = []
+        fed = []
+        for j in hunters:
+            for i in cells.near(xs[j], ys[j], 1):
+                if i not in claimed:
+                    claimed.add(i)
+                    eaten.append(i)
+                    fed.append(j)
+                    break
+        self.store[fed] += 1
+        self.fed[fed] = True
+        return numpy.array(eaten, dtype=numpy.int64)
+
+    def reproduce(self, threshold):
+        """Every agent whose store has reached threshold reproduces.
+
+        Parents have their store reset to 0 and a new agent with an empty
+        store is born at the location of each parent. Births are held back
+        until apply_births is called, so that the population does not change
+        size part way through a step.
+
+        Args:
+            threshold: Store size needed for an agent to reproduce
+
+        Returns:
+            Number of agents born
+        """
+        parents = numpy.flatnonzero(self.store >= threshold)
+        if len(parents) == 0:
+            return 0
+        self.store[parents] = 0
+        self.defer_births(self.x[parents], self.y[parents])
+        return len(parents)
+
+    def defer_births(self, x, y):
+        """Holds back agents born at x, y until apply_births is called.
+
+        Args:
+            x: Sequence of x coordinates
+            y: Sequence of y coordinates
+        """
+        self._births.append((numpy.asarray(x, dtype=numpy.int64),
+                             numpy.asarray(y, dtype=numpy.int64)))
+
+    def mortality(self, rng, death_rate=0.0, starvation=0.0):
+        """Finds the agents which die of starvation or natural causes.
+
+        Agents whose store has fallen below starvation, because they could not
+        pay for their moves, starve. Agents only starve once they have eaten,
+        so that those placed or born with an empty store have time to find
+        food. A starvation level below 0 lets agents draw on a reserve, e.g.
+        so that wolves, whose store is reset to 0 on reproduction, can keep
+        moving until their next kill. Every agent also
+        dies with a chance of death_rate. Agents are only flagged as dead, so
+        that they can be removed along with any others in a single call to
+        remove.
+
+        Args:
+            rng: numpy.random.Generator used to draw natural deaths
+            death_rate: Chance of each agent dying naturally within a step
+            starvation: Store below which agents starve
+
+        Returns:
+            Array of the indices of the agents that died
+        """
+        dead = (self.store < starvation) & self.fed
+        if death_rate:
+            dead |= rng.random(self._n) < death_rate
+        self.alive[dead] = False
+        return numpy.flatnonzero(dead)
+
+    def apply_births(self):
+        """Adds every agent born since the last call, all at once.
+
+        Returns:
+            Number of agents added
+        """
+        if not self._births:
+            return 0
+        x = numpy.concatenate([x for x, y in self._births])
+        y = numpy.concatenate([y for x, y in self._births])
+        self._births = []
+        self.extend(x, y, numpy.zeros(len(x)))
+        return len(x)
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Retrieves the starting locations of the sheep agents.
+
+This script downloads the page of preset starting locations used to place
+the flock, extracts the x and y coordinates from it and keeps them within a
+local cache file. Locations are fetched within a background thread, with a
+timeout, so that the download can happen while the environment is loading.
+Once cached, locations are reused until the cache expires, and an expired
+cache is still used if the page can not be reached, so that repeated and
+offline runs start straight away with the same locations.
+
+  Typical usage example:
+
+  fetch = PositionFetch()
+  environment = scenario.create_environment()
+  ys, xs = fetch.result()
+"""
+
+# Import required modules
+import json
+import os
+import re
+import threading
+import time
+
+
+# Page holding the preset starting locations of the sheep
+URL = ("http://www.geog.leeds.ac.uk/courses/computing/practicals/python/"
+       "agent-framework/part9/data.html")
+
+# Location of the cache, kept alongside the scripts
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     "start_positions.cache.json")
+
+# Seconds for which cached locations are used without fetching them again
+TTL = 24 * 60 * 60
+
+# Seconds to wait for the page before giving up
+TIMEOUT = 5
+
+# Matches the contents of table cells with a class of y or x
+_CELL = re.compile(r"<td[^>]*\bclass\s*=\s*[\"']?(y|x)[\"']?[^>]*>\s*"
+                   r"(-?\d+)\s*</td>", re.IGNORECASE)
+
+
+def extract_positions(html):
+    """Extracts the starting locations from the HTML of the page.
+
+    Args:
+        html: Text of the page
+
+    Returns:
+        Tuple of two lists of ints, the y coordinates and the x coordinates
+
+    Raises:
+        ValueError: If no locations are found or the coordinates do not pair
+        up
+    """
+    ys = []
+    xs = []
+    for axis, value in _CELL.findall(html):
+        (ys if axis.lower() == "y" else xs).append(int(value))
+    validate(ys, xs)
+    return ys, xs
+
+
+def validate(ys, xs):
+    """Checks that a list of locations can be used to place sheep.
+
+    Locations beyond the far edges of the environment are not rejected here,
+    as the size of the environment is not known until it has loaded, and are
+    left to random placement by scenario.set_sheep.
+
+    Raises:
+        ValueError: If the locations are empty, do not pair up or are not
+        whole numbers of at least 0
+    """
+    if not ys or len(ys) != len(xs):
+        raise ValueError("Starting locations are missing or incomplete")
+    for value in ys + xs:
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError("Starting location {} is outside the "
+                             "domain".format(value))
+
+
+def read_cache(path=CACHE, url=URL, ttl=TTL):
+    """Reads locations from the cache.
+
+    Args:
+        path: Location of the cache file
+        url: Page the locations must have come from
+        ttl: Age in seconds after which the cache has expired, None to accept
+             a cache of any age
+
+    Returns:
+        Tuple of y and x coordinate lists, or None if there is no valid cache
+    """
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        if cache["url"] != url:
+            return None
+        if ttl is not None and time.time() - cache["fetched"] > ttl:
+            return None
+        validate(cache["ys"], cache["xs"])
+        return cache["ys"], cache["xs"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def write_cache(ys, xs, path=CACHE, url=URL):
+    """Atomically writes locations to the cache. Failures are ignored."""
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump({"url": url, "fetched": time.time(), "ys": ys,
+                       "xs": xs}, f)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def download(url=URL, timeout=TIMEOUT):
+    """Downloads and extracts the locations from the page.
+
+    Raises:
+        requests.RequestException: If the page can not be retrieved
+        ValueError: If the page does not hold valid locations
+    """
+    import requests
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return extract_positions(response.text)
+
+
+def load_positions(url=URL, path=CACHE, ttl=TTL, timeout=TIMEOUT):
+    """Returns the starting locations, from the cache where possible.
+
+    A cache younger than ttl is used straight away. Otherwise the page is
+    downloaded and cached. If the download fails an expired cache is used.
+
+    Returns:
+        Tuple of y and x coordinate lists, or None if no locations are
+        available
+    """
+    positions = read_cache(path, url, ttl)
+    if positions is not None:
+        return positions
+    try:
+        positions = download(url, timeout)
+    except Exception:
+        return read_cache(path, url, None)
+    write_cache(positions[0], positions[1], path, url)
+    return positions
+
+
+class PositionFetch:
+    """PositionFetch class, used to load the starting locations in the
+    background.
+
+    The thread is started as soon as the object is created, so that other
+    work such as loading the environment can happen during the download.
+    """
+
+    def __init__(self, url=URL, path=CACHE, ttl=TTL, timeout=TIMEOUT):
+        """Inits PositionFetch and starts loading the locations."""
+        self._timeout = timeout
+        self._positions = None
+        self._thread = threading.Thread(
+            target=self._load, args=(url, path, ttl, timeout), daemon=True)
+        self._thread.start()
+
+    def _load(self, url, path, ttl, timeout):
+        self._positions = load_positions(url, path, ttl, timeout)
+
+    def result(self):
+        """Waits for the locations and returns them.
+
+        Returns:
+            Tuple of y and x coordinate lists, or None if no locations are
+            available
+        """
+        self._thread.join(self._timeout + 1)
+        return self._positions
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
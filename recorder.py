@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Records the population counts of every iteration to a file.
+
+This script defines the Recorder class, which records metrics of the model
+after every iteration: the size of the flock and wolf pack, the number of
+births, kills and other deaths, the total resource left within the
+environment and the mean store of the flock. Metrics are gathered into fixed
+size batches of columns and a background thread appends each full batch to a
+chunked columnar file, so that memory use stays bounded however long the run
+is.
+
+The file starts with a header line naming the columns and their types. Each
+chunk then holds the number of rows as an 8 byte integer followed by the raw
+values of every column in turn.
+
+  Typical usage example:
+
+  with Recorder("run.rec") as recorder:
+      simulation.run(1000000, callback=recorder)
+  columns = read("run.rec")
+"""
+
+# Import required modules
+import json
+import queue
+import threading
+import numpy
+
+
+# Columns recorded for every iteration, along with their types
+COLUMNS = (("iteration", "<i8"),
+           ("sheep", "<i8"),
+           ("wolves", "<i8"),
+           ("sheep_births", "<i8"),
+           ("wolf_births", "<i8"),
+           ("kills", "<i8"),
+           ("sheep_deaths", "<i8"),
+           ("wolf_deaths", "<i8"),
+           ("resource", "<f8"),
+           ("mean_store", "<f8"))
+
+# First bytes of every recording
+MAGIC = b"POPREC1\n"
+
+
+def metrics(model):
+    """Returns the recorded metrics of a simulation, in the order of
+    COLUMNS.
+
+    The total resource is taken from the running total of the simulation's
+    tracking.Tracker, if it has one, rather than by summing the environment.
+    A model with a census, e.g. a parallel.ParallelSimulation, gives its
+    counts from it rather than from its agents.
+    """
+    census = getattr(model, "census", None)
+    if census is not None:
+        sheep, wolves, store, resource = census
+        return (model.iteration, sheep, wolves, model.sheep_births,
+                model.wolf_births, model.kills, model.sheep_deaths,
+                model.wolf_deaths, resource, store / sheep if sheep else 0.0)
+    flock = model.flock
+    tracker = getattr(model, "tracker", None)
+    if tracker is None:
+        resource = float(model.environment.sum())
+    else:
+        resource = tracker.total
+    return (model.iteration, len(flock), len(model.wolves),
+            model.sheep_births, model.wolf_births, model.kills,
+            model.sheep_deaths, model.wolf_deaths, resource,
+            float(flock.store.mean()) if len(flock) else 0.0)
+
+
+class Recorder:
+    """Recorder class, used to stream the metrics of a run to a file.
+
+    Call the recorder with the simulation after every iteration, e.g. by
+    passing it as the callback of Simulation.run. At most two full batches
+    wait to be written at once.
+
+    Attributes:
+        path: Location of the file being written
+        batch_size: Number of iterations held before a chunk is written
+    """
+
+    def __init__(self, path, batch_size=4096):
+        """Inits Recorder with path and batch_size and starts the writer."""
+        self.path = path
+        self.batch_size = batch_size
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file.write(json.dumps(COLUMNS).encode() + b"\n")
+        self._batch = self._new_batch()
+        self._rows = 0
+        self._queue = queue.Queue(maxsize=2)
+        self._error = None
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def _new_batch(self):
+        return [numpy.empty(self.batch_size, dtype=dtype)
+                for name, dtype in COLUMNS]
+
+    def _write(self):
+        """Appends queued batches to the file until None is queued."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, rows = item
+            try:
+                self._file.write(numpy.array(rows, dtype="<i8").tobytes())
+                for column in batch:
+                    self._file.write(column[:rows].tobytes())
+            except Exception as error:
+                # Keep taking batches off the queue, so that the simulation
+                # never blocks, and raise the error from there
+                self._error = error
+
+    def _flush(self):
+        """Queues the current batch for writing and starts a new one."""
+        if self._rows:
+            self._queue.put((self._batch, self._rows))
+            self._batch = self._new_batch()
+            self._rows = 0
+
+    def record(self, values):
+        """Records one row of values, in the order of COLUMNS."""
+        if self._error is not None:
+            raise self._error
+        row = self._rows
+        for column, value in zip(self._batch, values):
+            column[row] = value
+        self._rows = row + 1
+        if self._rows == self.batch_size:
+            self._flush()
+
+    def __call__(self, model):
+        """Records the metrics of a simulation."""
+        self.record(metrics(model))
+
+    def close(self):
+        """Writes every remaining row and closes the file."""
+        if self._file.closed:
+            return
+        self._flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_chunks(path):
+    """Yields every chunk of a recording as a dictionary of column arrays."""
+    with open(path, "rb") as f:
+        if f.readline() != MAGIC:
+            raise ValueError("'{}' is not a recording".format(path))
+        columns = json.loads(f.readline())
+        while True:
+            count = f.read(8)
+            if len(count) < 8:
+                return
+            rows = int(numpy.frombuffer(count, dtype="<i8")[0])
+            chunk = {}
+            for name, dtype in columns:
+                chunk[name] = numpy.fromfile(f, dtype=dtype, count=rows)
+            yield chunk
+
+
+def read(path):
+    """Reads a whole recording.
+
+    Args:
+        path: Location of the recording
+
+    Returns:
+        Dictionary mapping each column name to an array of its values
+    """
+    chunks = list(read_chunks(path))
+    if not chunks:
+        return {name: numpy.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+    return {name: numpy.concatenate([chunk[name] for chunk in chunks])
+            for name in chunks[0]}
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
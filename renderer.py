@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Draws a simulation of the population model within a figure.
+
+This script defines the Renderer class. The heatmap of the environment, one
+collection of points for the flock and one for the wolf pack, the colorbar and
+the legend are all created once. Drawing a new iteration then only updates the
+image data, the point locations and the labels, and blitting is used where the
+backend supports it so that only these artists are redrawn. When the
+simulation tracks the cells of its environment which change, only those cells
+of the image data are updated.
+
+  Typical usage example:
+
+  renderer = Renderer(simulation)
+  renderer.draw(frame_number)
+"""
+
+# Import required modules
+import numpy
+import matplotlib.pyplot
+
+
+class Renderer:
+    """Renderer class, used to draw a simulation within a figure.
+
+    Attributes:
+        simulation: Simulation object to be drawn
+        fig: Figure in which the simulation is drawn
+        axes: Axes holding the heatmap and agents
+        image: Heatmap of the environment
+        sheep_plot: Collection of points marking the sheep
+        wolf_plot: Collection of points marking the wolves
+        label: Text showing the current iteration
+        legend: Legend showing the size of the flock and wolf pack
+    """
+
+    def __init__(self, simulation, fig=None):
+        """Inits Renderer with simulation and fig, creating every artist."""
+        if fig is None:
+            fig = matplotlib.pyplot.figure(figsize=(10, 10))
+        self.simulation = simulation
+        self.fig = fig
+        fig.clear()
+        axes = fig.add_subplot(1, 1, 1)
+        self.axes = axes
+        self.image = axes.imshow(simulation.environment, cmap='RdYlGn')
+        tracker = getattr(simulation, "tracker", None)
+        if tracker is not None:
+            # The image already shows every change made so far
+            tracker.take_dirty()
+        scale_bar = fig.colorbar(self.image, ax=axes)
+        scale_bar.set_label('Resources Available', fontsize=12, rotation=90)
+        height, width = simulation.environment.shape
+        axes.set_xlim(0, width)
+        axes.set_ylim(0, height)
+        axes.set_title('Wolves/Sheep Population Model', fontsize=20)
+        self.sheep_plot = axes.scatter([], [], c='white')
+        self.wolf_plot = axes.scatter([], [], c='black')
+        self.label = axes.text(0.02, 0.97, '', transform=axes.transAxes,
+                               fontsize=14, va='top')
+        self.legend = axes.legend((self.sheep_plot, self.wolf_plot),
+                                  ('Sheep', 'Wolves'),
+                                  scatterpoints=1,
+                                  bbox_to_anchor=(1, 0), loc="lower right",
+                                  ncol=3,
+                                  fontsize=12)
+
+    @property
+    def artists(self):
+        """List of the artists which change from one iteration to the next."""
+        return [self.image, self.sheep_plot, self.wolf_plot, self.label,
+                self.legend]
+
+    def draw(self, frame_number=None):
+        """Updates the artists to show the current state of the simulation.
+
+        Args:
+            frame_number: The iteration of the animation, the iteration of the
+                          simulation is shown if not given
+
+        Returns:
+            List of the artists which have been updated
+        """
+        simulation = self.simulation
+        flock = simulation.flock
+        wolves = simulation.wolves
+        if frame_number is None:
+            frame_number = simulation.iteration - 1
+        self._draw_environment()
+        self.sheep_plot.set_offsets(numpy.column_stack((flock.x, flock.y)))
+        self.wolf_plot.set_offsets(numpy.column_stack((wolves.x, wolves.y)))
+        self.label.set_text('Iteration {}'.format(frame_number + 1))
+        sheep_text, wolf_text = self.legend.get_texts()
+        sheep_text.set_text('Sheep: {}'.format(len(flock)))
+        wolf_text.set_text('Wolves: {}'.format(len(wolves)))
+        return self.artists
+
+    def _draw_environment(self):
+        """Updates the heatmap, copying only the cells which have changed
+        if the simulation tracks them."""
+        environment = self.simulation.environment
+        tracker = getattr(self.simulation, "tracker", None)
+        dirty = None if tracker is None else tracker.take_dirty()
+        if dirty is None:
+            self.image.set_data(environment)
+        elif len(dirty):
+            rows, cols = numpy.divmod(dirty, environment.shape[1])
+            self.image.get_array()[rows, cols] = environment[rows, cols]
+            self.image.stale = True
+
+    @property
+    def blit(self):
+        """True if the backend of the figure supports blitting."""
+        return bool(getattr(self.fig.canvas, 'supports_blit', False))
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
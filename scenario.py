@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Sets up the scenario of the population model: its environment and agents.
+
+This script loads the environment in which the agents act and creates the
+sheep and wolf agents placed within it, along with showing the errors met
+while doing so. It is shared by maincode, which animates the model, and by
+simulation and ensemble, which run it, so that none of them need import
+another only to build a scenario.
+
+  Typical usage example:
+
+  environment = create_environment("in.txt")
+  flock = set_sheep(environment, 20)
+  wolves = set_wolves(environment, 5)
+"""
+
+# Import required modules. Tkinter is slow to import and is only imported
+# once a message box is needed.
+import environment
+import framework
+import positions
+import sys
+
+
+def show_error(title, message):
+    """Displays an error to the user.
+
+    Displays the error within a message box. If no display is available, for
+    example when the model is run headless from the command line, the error is
+    printed to the console instead.
+
+    Args:
+        title: Title of the message box
+        message: Message to be displayed
+    """
+    try:
+        from tkinter import messagebox, TclError
+    except ImportError:
+        print("{}: {}".format(title, message), file=sys.stderr)
+        return
+    try:
+        messagebox.showerror(title, message)
+    except (TclError, RuntimeError):
+        print("{}: {}".format(title, message), file=sys.stderr)
+
+
+def create_environment(path="in.txt", mmap=False, dtype="float64"):
+    """Creates an environment for agents to inhabit and interact with.
+
+    Retrieves csv data from a defined .txt file from the document repository. 
+    This data is constructed into a 2-D array which matches the dimensions
+    defined by the csv file. A binary copy of the array is cached next to the
+    file so that later runs load it without parsing the text again. A .npy
+    raster may be given instead of a .txt file. If this file is not found in
+    the correct directory the user is informed and the program terminated
+
+    Args:
+        path - .txt file or .npy raster defining the enviroment and its
+        values, in.txt by default
+        mmap - If True the environment is memory-mapped rather than read into
+        memory
+        dtype - Type in which the values of the environment are held
+
+    Returns:
+        Enivironment - A 2-D array that represents the enivironment in 
+        which agents are to move around.
+
+    Raises:
+        Prints an error in the console asking the user to place in.txt file in 
+        the correct directory and terminates program
+    """
+    try:
+        return environment.load_environment(path, mmap=mmap, dtype=dtype)
+    except (OSError, ValueError):
+        # If error returned, inform user and state that the file is not in the 
+        # specified location
+        show_error("Error", "File '{}' not found in specified directory. Please ensure this file is in the correct location and rerun this scenario".format(path))
+        # End program
+        sys.exit()    
+
+
+def set_sheep(environment, num_of_sheep, fetch=None):
+    """Creates a list of sheep agents.
+
+    Uses preset online data in order to define the starting location of
+    the sheep agents. This data is downloaded with a timeout and cached
+    locally, so later runs start straight away and runs without a web
+    connection reuse the cached locations. If no locations are available, or
+    fewer locations than sheep, the remaining sheep are randomly placed using
+    the class method of the sheep class object
+
+    Args:
+        enviroment: This list models the enviroment in which sheep agents 
+        will be moving and interacting with.
+        num_of_sheep: This variable outlines how many sheep agents are to be 
+        created within this function.
+        fetch: Optional positions.PositionFetch started earlier, so that the
+        locations can be downloaded while the environment loads
+        
+
+    Returns:
+        flock: A list containing a defined amount of sheep
+    
+     Raises:
+        Prints message box if program is unable to retrieve the starting
+        coordinates of the sheep either online or from the cache
+    """           
+    #Initialise flock list and the world shared by every sheep
+    flock = []    
+    world = framework.World(flock, environment)
+    if fetch is None:
+        fetch = positions.PositionFetch()
+    start_positions = fetch.result()
+    if start_positions is None:
+        # If no locations are available, warn user
+        show_error("Information", "Unable to retrieve initial sheep starting locations. Scenario will be initialised with random data")
+        start_positions = ([], [])
+    # Locations outside the environment are left to random placement
+    height, width = len(environment), len(environment[0])
+    td_ys, td_xs = [], []
+    for _y, _x in zip(*start_positions):
+        if _y < height and _x < width:
+            td_ys.append(_y)
+            td_xs.append(_x)
+    # Create and return a list of sheep agents: flock
+    for i in range(num_of_sheep):
+        if i < len(td_ys):
+            _y = td_ys[i]
+            _x = td_xs[i]
+        else:
+            _y = None
+            _x = None
+        flock.append(framework.Sheep(world, _y, _x))
+    return flock
+
+
+def set_wolves(environment, num_of_wolves):
+    """Generate a list of wolf agents.
+
+    Generates a list of wolf agents. These agents are to be randomly placed
+    around the domain of the environment using the class methods defined within
+    the wolf object class. 
+    
+    Args:
+        enviroment: This list models the enviroment in which wolf agents 
+        will be moving and interacting with.
+        
+        num_of_sheep: This variable outlines how many wolf agents are to be 
+        created within this function.
+
+    Returns:
+        wolves: A list of wolf agents
+
+    Raises:
+        Null
+    """
+    # Initialise wolfpack list and the world shared by every wolf
+    wolves = []
+    world = framework.World(wolves, environment)
+    # Loop around the number of wolves to be defined and append this to list
+    for i in range(num_of_wolves):
+        #  Wolves are to be placed randomly. Set x,y values to null in order to let
+        #  these values be randomly defined within the Agent class.   
+        _y = None
+        _x = None
+        # Append wolves to list
+        wolves.append(framework.Wolf(world, _y, _x))
+    return wolves
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
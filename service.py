@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Runs a local service to which model runs can be submitted as jobs.
+
+This script defines the JobService class, an asyncio server which accepts
+specifications of model runs from clients on the local machine and queues
+them onto a pool of worker processes. Every worker loads the environment and
+the starting locations of the sheep once, when the service starts, so that a
+job only pays for building its agents and running its iterations. Progress
+and results are streamed back to the client which submitted the job.
+
+Clients connect over TCP and send one JSON object per line, each holding the
+parameters of a run, i.e. those set within gui.set_parameters along with a
+seed and the number of steps between progress messages. The service replies
+with one JSON object per line for each event of each job:
+
+  {"job": 1, "event": "queued", "spec": {...}}
+  {"job": 1, "event": "progress", "iteration": 10, "sheep": 25, ...}
+  {"job": 1, "event": "result", "iteration": 100, "sheep": 40, ...}
+
+A job which fails ends with an "error" event rather than a "result".
+
+  Typical usage example:
+
+  python service.py serve --port 8765
+  python service.py submit --sheep 10 20 --seeds 0 1 2 --iterations 100
+"""
+
+# Import required modules
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import environment
+import recorder
+import simulation
+
+
+# Parameters of a job alongside their default values. The first six are those
+# set within gui.set_parameters, and steps is the number of iterations between
+# progress messages, 0 for none.
+SPEC = (("num_of_sheep", 20),
+        ("num_of_wolves", 5),
+        ("neighbourhood", 20),
+        ("num_of_iterations", 100),
+        ("wolf_threshold", 1),
+        ("sheep_threshold", 100),
+        ("seed", None),
+        ("steps", 10))
+
+# Address the service listens on by default
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Environment and starting locations loaded by each worker process, along
+# with the queue on which it reports the events of its jobs
+_environment = None
+_fetch = None
+_events = None
+
+
+def validate(spec):
+    """Checks the specification of a job and fills in default values.
+
+    Args:
+        spec: Dictionary of job parameters, any of which may be left out
+
+    Returns:
+        Dictionary holding every parameter of SPEC
+
+    Raises:
+        ValueError: If spec has an unknown parameter, or a parameter which
+                    is not a whole number of at least 0
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("A job must be a JSON object")
+    names = [name for name, default in SPEC]
+    unknown = set(spec) - set(names)
+    if unknown:
+        raise ValueError("Unknown parameters: {}".format(
+            ", ".join(sorted(unknown))))
+    checked = {}
+    for name, default in SPEC:
+        value = spec.get(name, default)
+        if value is None and name == "seed":
+            checked[name] = None
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError("{} must be a whole number of at least 0".format(
+                name))
+        checked[name] = value
+    return checked
+
+
+class _Positions:
+    """Starting locations of the sheep fetched once by a worker, standing in
+    for a positions.PositionFetch."""
+
+    def __init__(self, positions):
+        self._positions = positions
+
+    def result(self):
+        return self._positions
+
+
+def _warm(path, events):
+    """Loads the environment and starting locations within a worker."""
+    global _environment, _fetch, _events
+    import positions
+    _environment = environment.load_environment(path)
+    found = positions.PositionFetch().result()
+    if found is None:
+        # Place the sheep of every job randomly rather than reporting the
+        # missing locations once per job
+        print("Information: Unable to retrieve initial sheep starting "
+              "locations. Jobs will be initialised with random data",
+              file=sys.stderr)
+        found = ([], [])
+    _fetch = _Positions(found)
+    _events = events
+
+
+def _ready():
+    """Returns the id of the worker process, once it has been warmed."""
+    return os.getpid()
+
+
+def _event(job, event, model):
+    """Returns an event of a job holding the metrics of its model."""
+    names = [name for name, dtype in recorder.COLUMNS]
+    message = {"job": job, "event": event}
+    message.update(zip(names, recorder.metrics(model)))
+    return message
+
+
+def _run(job, spec):
+    """Runs a job within a worker, reporting its progress and result."""
+    model = simulation.Simulation.create(
+        spec["num_of_sheep"], spec["num_of_wolves"], spec["neighbourhood"],
+        spec["wolf_threshold"], spec["sheep_threshold"], seed=spec["seed"],
+        environment=_environment.copy(), fetch=_fetch)
+    steps = spec["steps"]
+    for i in range(spec["num_of_iterations"]):
+        model.step()
+        if steps and model.iteration % steps == 0:
+            _events.put(_event(job, "progress", model))
+    # The result follows the progress of the job on the same queue, so that
+    # it always arrives last
+    _events.put(_event(job, "result", model))
+
+
+class JobService:
+    """JobService class, used to run submitted jobs on a warm worker pool.
+
+    Start the service with start, then either serve clients with serve or
+    submit jobs from the same process with submit. Close it with close, or
+    use it as an async context manager.
+
+    Attributes:
+        path: Location of the environment loaded by every worker
+        processes: Number of worker processes
+    """
+
+    def __init__(self, path="in.txt", processes=None):
+        """Inits JobService with path and the number of processes."""
+        self.path = path
+        self.processes = processes or os.cpu_count() or 1
+        self._pool = None
+        self._events = None
+        self._pump = None
+        self._jobs = {}
+        self._ids = itertools.count(1)
+
+    async def start(self):
+        """Starts the worker processes and waits for them all to warm up."""
+        context = multiprocessing.get_context("spawn")
+        self._events = context.Queue()
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self.processes, mp_context=context, initializer=_warm,
+            initargs=(self.path, self._events))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._pool, _ready)
+                               for i in range(self.processes)])
+        self._pump = asyncio.ensure_future(self._forward())
+
+    async def _forward(self):
+        """Passes the events reported by the workers on to their jobs."""
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await loop.run_in_executor(None, self._events.get)
+            if message is None:
+                return
+            queue = self._jobs.get(message["job"])
+            if queue is not None:
+                queue.put_nowait(message)
+
+    async def submit(self, spec):
+        """Queues a job and yields its events as they happen.
+
+        Args:
+            spec: Dictionary of job parameters, see SPEC
+
+        Yields:
+            Dictionaries of the events of the job, ending with its result
+            or an error
+        """
+        job = next(self._ids)
+        try:
+            spec = validate(spec)
+        except ValueError as error:
+            yield {"job": job, "event": "error", "message": str(error)}
+            return
+        queue = asyncio.Queue()
+        self._jobs[job] = queue
+        try:
+            yield {"job": job, "event": "queued", "spec": spec}
+            future = asyncio.get_running_loop().run_in_executor(
+                self._pool, _run, job, spec)
+
+
+            def failed(done):
+                # A job which raised reports nothing more on the event queue
+                if not done.cancelled() and done.exception() is not None:
+                    queue.put_nowait({"job": job, "event": "error",
+                                      "message": repr(done.exception())})
+
+            future.add_done_callback(failed)
+            while True:
+                message = await queue.get()
+                yield message
+                if message["event"] in ("result", "error"):
+                    return
+        finally:
+            del self._jobs[job]
+
+    async def _stream(self, spec, writer):
+        """Writes the events of a job to a client."""
+        async for message in self.submit(spec):
+            writer.write((json.dumps(message) + "\n").encode())
+            await writer.drain()
+
+    async def _handle(self, reader, writer):
+        """Serves a client, running every job it sends."""
+        streams = []
+        try:
+            async for line in reader:
+                if not line.strip():
+                    continue
+                try:
+                    spec = json.loads(line)
+                except ValueError:
+                    spec = None
+                streams.append(asyncio.ensure_future(
+                    self._stream(spec, writer)))
+            await asyncio.gather(*streams)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        """Accepts clients on host and port until cancelled."""
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        """Stops the worker processes once their jobs have finished."""
+        if self._pool is None:
+            return
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._pool.shutdown)
+        self._events.put(None)
+        await self._pump
+        self._pool = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+async def submit(specs, host=HOST, port=PORT):
+    """Submits jobs to a running service and yields their events.
+
+    Args:
+        specs: List of dictionaries of job parameters
+        host: Address of the service
+        port: Port of the service
+
+    Yields:
+        Dictionaries of the events of every job, in the order they happen
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    for spec in specs:
+        writer.write((json.dumps(spec) + "\n").encode())
+    await writer.drain()
+    writer.write_eof()
+    async for line in reader:
+        yield json.loads(line)
+    writer.close()
+
+
+async def _serve(args):
+    """Runs the service until interrupted."""
+    async with JobService(args.environment, args.processes) as service:
+        print("Serving {} workers on {}:{}".format(service.processes,
+                                                  args.host, args.port))
+        await service.serve(args.host, args.port)
+
+
+async def _submit(args):
+    """Submits every combination of the parameters given and prints the
+    events of each job."""
+    specs = []
+    for values in itertools.product(args.sheep, args.wolves,
+                                    args.neighbourhood, args.wolf_threshold,
+                                    args.sheep_threshold, args.seeds):
+        spec = dict(zip(("num_of_sheep", "num_of_wolves", "neighbourhood",
+                         "wolf_threshold", "sheep_threshold", "seed"),
+                        values))
+        spec.update(num_of_iterations=args.iterations, steps=args.steps)
+        specs.append(spec)
+    failed = False
+    async for message in submit(specs, args.host, args.port):
+        print(json.dumps(message))
+        failed = failed or message["event"] == "error"
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    """Runs the service, or submits jobs to it, from the command line.
+
+    Args:
+        argv: List of command line arguments, defaults to sys.argv
+
+    Returns:
+        Exit status of the program
+    """
+    parser = argparse.ArgumentParser(
+        description="Run or submit jobs to the population model service.")
+    address = argparse.ArgumentParser(add_help=False)
+    address.add_argument("--host", default=HOST)
+    address.add_argument("--port", type=int, default=PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", parents=[address],
+                                help="start the service")
+    serve.add_argument("--processes", type=int, default=None)
+    serve.add_argument("--environment", default="in.txt")
+    send = commands.add_parser(
+        "submit", parents=[address],
+        help="submit every combination of the values given")
+    send.add_argument("--sheep", type=int, nargs="+", default=[20])
+    send.add_argument("--wolves", type=int, nargs="+", default=[5])
+    send.add_argument("--neighbourhood", type=int, nargs="+", default=[20])
+    send.add_argument("--wolf-threshold", type=int, nargs="+", default=[1])
+    send.add_argument("--sheep-threshold", type=int, nargs="+",
+                      default=[100])
+    send.add_argument("--seeds", type=int, nargs="+", default=[0])
+    send.add_argument("--iterations", type=int, default=100)
+    send.add_argument("--steps", type=int, default=10,
+                      help="iterations between progress messages, 0 for "
+                           "none")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "serve":
+            asyncio.run(_serve(args))
+            return 0
+        return asyncio.run(_submit(args))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Headless simulation engine for the population model.
+
+This script defines the Simulation class which owns the flock, the wolf pack
+and the environment of a single model run. The model can be advanced one
+iteration at a time or for a defined number of iterations without any plotting
+taking place, so that long runs are limited by the speed of the model rather
+than the speed of the animation. A renderer can optionally be attached.
+
+  Typical usage example:
+
+  simulation = Simulation.create(20, 5, 20, 1, 100, seed=1)
+  simulation.run(1000)
+  len(simulation.flock)
+
+  From the command line:
+
+  python simulation.py --iterations 1000 --sheep 20 --wolves 5
+"""
+
+# Import required modules
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+import numpy
+import backends
+import checkpoint
+import environment
+import framework
+import population
+import positions
+import recorder
+import scenario
+import telemetry
+import tracking
+
+
+class Simulation:
+    """Simulation class, used to hold and advance the state of a model run.
+
+    Holds the agents and environment built by the functions create_environment,
+    set_sheep and set_wolves within scenario and applies the behaviours
+    defined within framework to them. The agents are held as array backed
+    populations so that behaviours are applied to a whole flock at once. No
+    plotting happens within this class.
+
+    Attributes:
+        environment: 2-D array modelling the enviroment in which agents
+        will be moving and interacting with.
+        flock: Population containing sheep agents
+        wolves: Population containing wolf agents
+        neighbourhood: Constant defining the distance at which sheep agents can
+        share resources
+        wolf_threshold: Number of sheep needed to be consumed for
+                        wolves to reproduce
+        sheep_threshold: Store size needed for sheep to reproduce
+        regrowth: Fraction of the gap to capacity which each cell of the
+                  environment regrows every iteration
+        capacity: Most resources a cell of the environment can regrow to
+        diffusion: Fraction of the difference with its neighbours which each
+                   cell of the environment exchanges every iteration
+        sheep_move_cost: Energy taken from the store of a sheep on each move
+        wolf_move_cost: Energy taken from the store of a wolf on each move
+        death_rate: Chance of each agent dying naturally every iteration
+        starvation: Store below which agents starve
+        iteration: Number of iterations completed so far
+        rng: numpy.random.Generator driving every random choice of the model
+        profiler: Optional telemetry.Profiler recording the time spent within
+                  each phase of a step
+        backend: Backend from backends applying the behaviours of the agents
+        tracker: tracking.Tracker keeping running sums of the environment
+        sheep_births: Number of sheep born within the last iteration
+        wolf_births: Number of wolves born within the last iteration
+        kills: Number of sheep eaten within the last iteration
+        sheep_deaths: Number of sheep which starved or died naturally within
+                      the last iteration
+        wolf_deaths: Number of wolves which starved or died naturally within
+                     the last iteration
+    """
+
+    def __init__(self, environment, flock, wolves, neighbourhood,
+                 wolf_threshold, sheep_threshold, seed=None, regrowth=0.0,
+                 capacity=None, diffusion=0.0, sheep_move_cost=0.0,
+                 wolf_move_cost=0.0, death_rate=0.0, starvation=0.0,
+                 backend=None):
+        """Inits Simulation with the environment, agents and parameters.
+
+        The environment may be given as a list of lists and the agents as lists
+        of Sheep and Wolf objects, in which case they are converted to arrays.
+        An environment which is already an array, including a memory-mapped
+        one, is used as it is, keeping its dtype. If no capacity is given,
+        cells regrow up to the largest value found within the environment.
+        The behaviours of the agents are applied by the backend named, by
+        default the one given by backends.get.
+        """
+        if not isinstance(environment, numpy.ndarray):
+            environment = numpy.asarray(environment, dtype=numpy.float64)
+        self.environment = environment
+        if not isinstance(flock, population.Population):
+            flock = population.Population.from_agents(
+                flock, self.environment, framework.Sheep)
+        if not isinstance(wolves, population.Population):
+            wolves = population.Population.from_agents(
+                wolves, self.environment, framework.Wolf)
+        self.flock = flock
+        self.wolves = wolves
+        self.neighbourhood = neighbourhood
+        self.wolf_threshold = wolf_threshold
+        self.sheep_threshold = sheep_threshold
+        self.regrowth = regrowth
+        self.diffusion = diffusion
+        if capacity is None and (regrowth or diffusion):
+            capacity = float(environment.max())
+        self.capacity = capacity
+        self.sheep_move_cost = sheep_move_cost
+        self.wolf_move_cost = wolf_move_cost
+        self.death_rate = death_rate
+        self.starvation = starvation
+        self.iteration = 0
+        self.rng = numpy.random.default_rng(seed)
+        self.profiler = None
+        self.backend = backends.get(backend)
+        self.tracker = tracking.Tracker(self.environment)
+        self.sheep_births = 0
+        self.wolf_births = 0
+        self.kills = 0
+        self.sheep_deaths = 0
+        self.wolf_deaths = 0
+
+    @classmethod
+    def create(cls, num_of_sheep, num_of_wolves, neighbourhood,
+               wolf_threshold, sheep_threshold, seed=None, path="in.txt",
+               sheep_file=None, wolves_file=None, mmap=False,
+               dtype="float64", regrowth=0.0, capacity=None, diffusion=0.0,
+               sheep_move_cost=0.0, wolf_move_cost=0.0, death_rate=0.0,
+               starvation=0.0, environment=None, fetch=None, backend=None):
+        """Builds a simulation from the model parameters.
+
+        Args:
+            num_of_sheep: Number of sheep in initial iteration
+            num_of_wolves: Number of wolves in initial iteration
+            neighbourhood: range at which sheep can share resources
+            wolf_threshold: Number of sheep needed to be consumed for
+                            wolves to reproduce
+            sheep_threshold: Store size needed for sheep to reproduce
+            seed: Optional seed for the random number generator
+            path: Location of the .txt file or .npy raster defining the
+                  environment
+            sheep_file: Optional .csv or .npy file of sheep locations and
+                        stores, used in place of num_of_sheep
+            wolves_file: Optional .csv or .npy file of wolf locations and
+                         stores, used in place of num_of_wolves
+            mmap: If True the environment is memory-mapped rather than read
+                  into memory
+            dtype: Type in which the values of the environment are held
+            regrowth: Fraction of the gap to capacity regrown every iteration
+            capacity: Most resources a cell can regrow to
+            diffusion: Fraction of the difference with its neighbours which
+                       each cell exchanges every iteration
+            sheep_move_cost: Energy taken from the store of a sheep on each
+                             move
+            wolf_move_cost: Energy taken from the store of a wolf on each move
+            death_rate: Chance of each agent dying naturally every iteration
+            starvation: Store below which agents starve
+            environment: Optional environment already loaded, used in place
+                         of path. It is changed by the run, so pass a copy
+                         to reuse it.
+            fetch: Optional positions.PositionFetch already started, used in
+                   place of fetching the starting locations of the sheep
+            backend: Optional name of the backend applying the behaviours of
+                     the agents
+
+        Returns:
+            A Simulation at iteration 0
+        """
+        if seed is not None:
+            random.seed(seed)
+        # Fetch the starting locations of the sheep while the environment
+        # loads
+        if sheep_file:
+            fetch = None
+        elif fetch is None:
+            fetch = positions.PositionFetch()
+        if environment is None:
+            environment = scenario.create_environment(path, mmap, dtype)
+        if sheep_file:
+            flock = population.Population.load(sheep_file, environment,
+                                               framework.Sheep)
+        else:
+            flock = scenario.set_sheep(environment, num_of_sheep, fetch)
+        if wolves_file:
+            wolves = population.Population.load(wolves_file, environment,
+                                                framework.Wolf)
+        else:
+            wolves = scenario.set_wolves(environment, num_of_wolves)
+        return cls(environment, flock, wolves, neighbourhood,
+                   wolf_threshold, sheep_threshold, seed=seed,
+                   regrowth=regrowth, capacity=capacity, diffusion=diffusion,
+                   sheep_move_cost=sheep_move_cost,
+                   wolf_move_cost=wolf_move_cost, death_rate=death_rate,
+                   starvation=starvation, backend=backend)
+
+    def _phase(self, name, function, *args):
+        """Calls function, timing it as phase name if a profiler is
+        attached."""
+        profiler = self.profiler
+        if profiler is None:
+            return function(*args)
+        start = time.perf_counter()
+        result = function(*args)
+        profiler.record(name, time.perf_counter() - start)
+        return result
+
+    def _shuffle(self):
+        """Randomly shuffles the flock and wolf pack."""
+        self.flock.shuffle(self.rng)
+        self.wolves.shuffle(self.rng)
+
+    def _graze(self):
+        """Lets the flock graze, recording the cells grazed."""
+        cells, taken = self.backend.graze(self.flock)
+        self.tracker.record(cells, -taken.astype(numpy.float64))
+
+    def _regrow(self):
+        """Regrows and diffuses the whole environment."""
+        environment.regrow(self.environment, self.regrowth, self.capacity,
+                           self.diffusion, self.rng)
+        self.tracker.refresh()
+
+    def _mortality(self, eaten):
+        """Removes eaten sheep and agents that starved or died naturally."""
+        dead = self.flock.mortality(self.rng, self.death_rate,
+                                    self.starvation)
+        self.sheep_deaths = len(numpy.setdiff1d(dead, eaten))
+        self.flock.remove(numpy.concatenate((eaten, dead)))
+        dead = self.wolves.mortality(self.rng, self.death_rate,
+                                     self.starvation)
+        self.wolf_deaths = len(dead)
+        self.wolves.remove(dead)
+
+    def _births(self):
+        """Adds the agents born within this iteration."""
+        self.flock.apply_births()
+        self.wolves.apply_births()
+
+    def step(self):
+        """Advances the model by one iteration.
+
+        Agents are shuffled, then the flock moves, eats, shares with its
+        neighbours and reproduces. The pack then moves, every wolf eats an
+        adjacent sheep if there is one and the pack reproduces. Sheep that
+        have been eaten and agents which have starved or died naturally are
+        removed at the end of the iteration, after which the agents born
+        within the iteration are added. Finally the environment regrows and
+        diffuses, if enabled.
+        """
+        flock = self.flock
+        wolves = self.wolves
+        backend = self.backend
+        phase = self._phase
+        if self.profiler is not None:
+            self.profiler.begin_step()
+        # Randomly shuffle agents
+        phase("shuffle", self._shuffle)
+
+        # Apply each sheep behaviour to the whole flock
+        phase("sheep_move", backend.move, flock, self.rng,
+              self.sheep_move_cost)
+        phase("sheep_eat", self._graze)
+        phase("sheep_share", backend.share, flock, self.neighbourhood)
+        self.sheep_births = phase("sheep_reproduce", backend.reproduce,
+                                  flock, self.sheep_threshold)
+
+        # Wolves move, then each eats at most one adjacent sheep which no
+        # other wolf has claimed
+        phase("wolf_move", backend.move, wolves, self.rng,
+              self.wolf_move_cost)
+        sheep_to_remove = phase("wolf_eat", backend.predate, wolves, flock)
+        self.wolf_births = phase("wolf_reproduce", backend.reproduce, wolves,
+                                 self.wolf_threshold)
+        self.kills = len(sheep_to_remove)
+
+        # Remove sheep that have fallen foul to wolves along with agents that
+        # have starved or died naturally, then add this iteration's births
+        phase("mortality", self._mortality, sheep_to_remove)
+        phase("births", self._births)
+
+        # Resources regrow towards capacity and spread between cells
+        if self.regrowth or self.diffusion:
+            phase("regrow", self._regrow)
+        self.iteration += 1
+        if self.profiler is not None:
+            self.profiler.end_step(self)
+
+    def run(self, num_of_iterations, callback=None):
+        """Advances the model by a defined number of iterations.
+
+        Args:
+            num_of_iterations: Number of iterations to run
+            callback: Optional function called with the simulation after
+                      every iteration, e.g. to draw it
+
+        Returns:
+            The simulation itself
+        """
+        for i in range(num_of_iterations):
+            self.step()
+            if callback is not None:
+                callback(self)
+        return self
+
+
+def main(argv=None):
+    """Runs the population model from the command line.
+
+    Runs the model without any plotting for the number of iterations requested
+    and reports the final population sizes and the speed of the run. If
+    --render is given the model is instead animated within a figure. A run
+    resumed from a checkpoint continues until the total number of iterations
+    requested has been reached.
+
+    Args:
+        argv: List of command line arguments, defaults to sys.argv
+
+    Returns:
+        Exit status of the program
+    """
+    parser = argparse.ArgumentParser(description="Run the population model.")
+    parser.add_argument("--sheep", type=int, default=20)
+    parser.add_argument("--wolves", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--neighbourhood", type=int, default=20)
+    parser.add_argument("--wolf-threshold", type=int, default=1)
+    parser.add_argument("--sheep-threshold", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--environment", default="in.txt",
+                        help=".txt file or .npy raster of the environment")
+    parser.add_argument("--regrowth", type=float, default=0.0,
+                        help="fraction of the gap to capacity each cell "
+                             "regrows every iteration")
+    parser.add_argument("--capacity", type=float, default=None,
+                        help="most resources a cell can regrow to, the "
+                             "largest initial value by default")
+    parser.add_argument("--diffusion", type=float, default=0.0,
+                        help="fraction of the difference with its neighbours "
+                             "each cell exchanges every iteration")
+    parser.add_argument("--sheep-move-cost", type=float, default=0.0,
+                        help="energy a sheep spends on each move")
+    parser.add_argument("--wolf-move-cost", type=float, default=0.0,
+                        help="energy a wolf spends on each move")
+    parser.add_argument("--death-rate", type=float, default=0.0,
+                        help="chance of each agent dying naturally every "
+                             "iteration")
+    parser.add_argument("--starvation", type=float, default=0.0,
+                        help="store below which agents starve, below 0 to "
+                             "give agents a reserve")
+    parser.add_argument("--mmap", action="store_true",
+                        help="memory-map the environment rather than reading "
+                             "it into memory")
+    parser.add_argument("--dtype", default="float64",
+                        help="type in which the environment is held, e.g. "
+                             "float32 or uint16")
+    parser.add_argument("--sheep-file", default=None,
+                        help=".csv or .npy file of sheep to start with")
+    parser.add_argument("--wolves-file", default=None,
+                        help=".csv or .npy file of wolves to start with")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="folder in which to write checkpoints")
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--record", default=None,
+                        help="file to which the counts of every iteration "
+                             "are streamed")
+    parser.add_argument("--resume", default=None,
+                        help="checkpoint, or folder of checkpoints, to "
+                             "resume from")
+    parser.add_argument("--render", action="store_true",
+                        help="animate the run within a figure")
+    parser.add_argument("--profile", action="store_true",
+                        help="report the time spent within each phase")
+    parser.add_argument("--backend", default=None,
+                        choices=backends.available(),
+                        help="implementation of the behaviours of the "
+                             "agents, the fastest available by default")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="split the environment into strips run by this "
+                             "many processes")
+    args = parser.parse_args(argv)
+    if args.processes is not None and (args.render or args.profile or
+                                       args.checkpoint_dir):
+        parser.error("--processes can not be used with --render, --profile "
+                     "or --checkpoint-dir")
+    if args.processes is not None and args.backend not in (None, "numpy"):
+        # Strips apply the behaviours of their agents with the methods of
+        # population.Population, as the numpy backend does
+        parser.error("--processes can only be used with the numpy backend")
+    for name, value in (("regrowth", args.regrowth),
+                        ("diffusion", args.diffusion)):
+        if not 0 <= value <= 1:
+            parser.error("--{} must be between 0 and 1".format(name))
+
+    resume = args.resume
+    if resume is not None and os.path.isdir(resume):
+        resume = checkpoint.latest(resume)
+    if resume is not None:
+        simulation = checkpoint.load(resume)
+        if args.backend:
+            simulation.backend = backends.get(args.backend)
+    else:
+        simulation = Simulation.create(args.sheep, args.wolves,
+                                       args.neighbourhood,
+                                       args.wolf_threshold,
+                                       args.sheep_threshold, seed=args.seed,
+                                       path=args.environment,
+                                       sheep_file=args.sheep_file,
+                                       wolves_file=args.wolves_file,
+                                       mmap=args.mmap, dtype=args.dtype,
+                                       regrowth=args.regrowth,
+                                       capacity=args.capacity,
+                                       diffusion=args.diffusion,
+                                       sheep_move_cost=args.sheep_move_cost,
+                                       wolf_move_cost=args.wolf_move_cost,
+                                       death_rate=args.death_rate,
+                                       starvation=args.starvation,
+                                       backend=args.backend)
+    if args.profile:
+        simulation.profiler = telemetry.Profiler()
+    if args.render:
+        import matplotlib.pyplot
+        import maincode
+        maincode.animate(simulation, args.iterations)
+        matplotlib.pyplot.show()
+        return 0
+
+    # A resumed run carries on until the total number of iterations is reached
+    remaining = max(args.iterations - simulation.iteration, 0)
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        callbacks = []
+        if args.checkpoint_dir:
+            callbacks.append(stack.enter_context(checkpoint.Checkpointer(
+                args.checkpoint_dir, args.checkpoint_every)))
+        if args.record:
+            callbacks.append(stack.enter_context(
+                recorder.Recorder(args.record)))
+        if args.processes is not None:
+            import parallel
+            simulation = stack.enter_context(
+                parallel.ParallelSimulation(simulation, args.processes))
+        simulation.run(remaining, callback=lambda model: [
+            callback(model) for callback in callbacks])
+    elapsed = time.perf_counter() - start
+    print("Iterations: {}".format(simulation.iteration))
+    print("Sheep: {}".format(len(simulation.flock)))
+    print("Wolves: {}".format(len(simulation.wolves)))
+    print("Time: {:.3f}s ({:.1f} iterations/s)".format(
+        elapsed, remaining / elapsed if elapsed else 0.0))
+    if args.profile:
+        print(simulation.profiler.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Spatial index used to find agents lying close to a location.
+
+This script defines the CellList class. The domain is divided into a uniform
+grid of square cells and every agent is placed into the bucket of the cell it
+lies within. Agents near a location can then be found by only looking at the
+buckets of the surrounding cells rather than at every agent in the population.
+
+  Typical usage example:
+
+  cells = CellList(flock.x, flock.y, neighbourhood)
+  for j in cells.near(x, y, neighbourhood):
+      ...
+"""
+
+# Import required modules
+import numpy
+
+
+class CellList:
+    """CellList class, used to bucket agents by the grid cell they lie within.
+
+    Buckets hold agent indices in ascending order, so that agents returned by
+    a search are visited in the same order as within the population itself.
+
+    Attributes:
+        cell_size: Width and height of each grid cell
+        buckets: Dictionary mapping (cell_x, cell_y) to a list of indices
+    """
+
+    def __init__(self, x, y, cell_size):
+        """Inits CellList from coordinate arrays and cell_size.
+
+        Args:
+            x: Array of x coordinates
+            y: Array of y coordinates
+            cell_size: Width and height of each grid cell, normally the
+                       distance over which agents interact
+        """
+        self.cell_size = max(int(numpy.ceil(cell_size)), 1)
+        self.buckets = {}
+        self._near = {}
+        if len(x) == 0:
+            return
+        cell_x = numpy.asarray(x) // self.cell_size
+        cell_y = numpy.asarray(y) // self.cell_size
+        # Sort agents by cell, keeping index order within each cell, then
+        # split the sorted indices at every change of cell
+        order = numpy.lexsort((cell_x, cell_y))
+        sorted_x = cell_x[order]
+        sorted_y = cell_y[order]
+        change = numpy.flatnonzero((sorted_x[1:] != sorted_x[:-1]) |
+                                   (sorted_y[1:] != sorted_y[:-1])) + 1
+        starts = numpy.concatenate(([0], change))
+        for start, bucket in zip(starts.tolist(),
+                                 numpy.split(order, change)):
+            key = (int(sorted_x[start]), int(sorted_y[start]))
+            self.buckets[key] = bucket.tolist()
+
+    def cell_of(self, x, y):
+        """Returns the (cell_x, cell_y) key of the cell containing x, y."""
+        return (x // self.cell_size, y // self.cell_size)
+
+    def near(self, x, y, radius):
+        """Returns the indices of every agent that may lie within radius.
+
+        All agents within radius of x, y are returned, along with some agents
+        which lie slightly further away, so callers still need to check the
+        distance. Results are cached per cell and should not be modified.
+
+        Args:
+            x: x coordinate of the location
+            y: y coordinate of the location
+            radius: Distance to search
+
+        Returns:
+            Sorted list of agent indices
+        """
+        span = max(int(numpy.ceil(radius / self.cell_size)), 0)
+        cell_x, cell_y = self.cell_of(x, y)
+        key = (cell_x, cell_y, span)
+        found = self._near.get(key)
+        if found is None:
+            found = []
+            for i in range(cell_x - span, cell_x + span + 1):
+                for j in range(cell_y - span, cell_y + span + 1):
+                    found.extend(self.buckets.get((i, j), ()))
+            found.sort()
+            self._near[key] = found
+        return found
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
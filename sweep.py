@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Runs the population model over a grid of parameters.
+
+This script runs every combination of a grid of model parameters a defined
+number of times, spreading the runs over a pool of worker processes. The size
+of the flock and wolf pack after every iteration of every run is collected
+into a single table, which can be written to a .csv file.
+
+  Typical usage example:
+
+  rows = sweep({"num_of_sheep": [10, 50], "num_of_wolves": [5]},
+               replicates=3, num_of_iterations=100)
+
+  From the command line:
+
+  python sweep.py --sheep 10 50 --wolves 5 10 --replicates 3 --output out.csv
+"""
+
+# Import required modules
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import os
+import sys
+import simulation
+
+
+# Parameters of a run, in the order taken by Simulation.create, alongside
+# the value used when a parameter is left out of a grid
+PARAMETERS = (("num_of_sheep", 10),
+              ("num_of_wolves", 5),
+              ("neighbourhood", 5),
+              ("wolf_threshold", 1),
+              ("sheep_threshold", 100),
+              ("regrowth", 0.0),
+              ("diffusion", 0.0),
+              ("sheep_move_cost", 0.0),
+              ("wolf_move_cost", 0.0),
+              ("death_rate", 0.0),
+              ("starvation", 0.0))
+
+# Columns of the results table
+COLUMNS = ([name for name, default in PARAMETERS] +
+           ["replicate", "seed", "iteration", "sheep", "wolves"])
+
+
+def expand(grid, replicates, seed=0):
+    """Lists every run of a parameter grid.
+
+    Args:
+        grid: Dictionary mapping parameter names to lists of values
+        replicates: Number of runs of each combination of parameters
+        seed: Seed of the first run, later runs use consecutive seeds
+
+    Returns:
+        List of dictionaries, one per run, holding every parameter along
+        with the replicate number and seed
+
+    Raises:
+        ValueError: If grid contains an unknown parameter
+    """
+    names = [name for name, default in PARAMETERS]
+    unknown = set(grid) - set(names)
+    if unknown:
+        raise ValueError("Unknown parameters: {}".format(
+            ", ".join(sorted(unknown))))
+    values = [grid.get(name, [default]) for name, default in PARAMETERS]
+    runs = []
+    for combination in itertools.product(*values):
+        for replicate in range(replicates):
+            run = dict(zip(names, combination))
+            run["replicate"] = replicate
+            run["seed"] = seed + len(runs)
+            runs.append(run)
+    return runs
+
+
+def run_one(run, num_of_iterations, path="in.txt"):
+    """Runs the model once and records the population sizes.
+
+    Args:
+        run: Dictionary of parameters, as returned by expand
+        num_of_iterations: Number of iterations to run
+        path: Location of the .txt file defining the environment
+
+    Returns:
+        List of rows, one per iteration, each a dictionary keyed by COLUMNS
+    """
+    model = simulation.Simulation.create(
+        **{name: run[name] for name, default in PARAMETERS},
+        seed=run["seed"], path=path)
+    rows = []
+    for i in range(num_of_iterations):
+        model.step()
+        row = dict(run)
+        row["iteration"] = model.iteration
+        row["sheep"] = len(model.flock)
+        row["wolves"] = len(model.wolves)
+        rows.append(row)
+    return rows
+
+
+def sweep(grid, replicates=1, num_of_iterations=50, processes=None, seed=0,
+          path="in.txt"):
+    """Runs every combination of a parameter grid over a process pool.
+
+    Args:
+        grid: Dictionary mapping parameter names to lists of values
+        replicates: Number of runs of each combination of parameters
+        num_of_iterations: Number of iterations of each run
+        processes: Number of worker processes, defaults to one per core
+        seed: Seed of the first run, later runs use consecutive seeds
+        path: Location of the .txt file defining the environment
+
+    Returns:
+        List of rows in run order, each a dictionary keyed by COLUMNS
+    """
+    runs = expand(grid, replicates, seed)
+    processes = processes or os.cpu_count() or 1
+    rows = []
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        results = pool.map(run_one, runs,
+                           itertools.repeat(num_of_iterations),
+                           itertools.repeat(path),
+                           chunksize=max(len(runs) // (4 * processes), 1))
+        for result in results:
+            rows.extend(result)
+    return rows
+
+
+def write_csv(rows, output):
+    """Writes the results table to a .csv file."""
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    """Runs a parameter sweep from the command line.
+
+    Each parameter accepts a list of values, and every combination of the
+    values given is run.
+
+    Args:
+        argv: List of command line arguments, defaults to sys.argv
+
+    Returns:
+        Exit status of the program
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the population model over a grid of parameters.")
+    parser.add_argument("--sheep", type=int, nargs="+", default=[10])
+    parser.add_argument("--wolves", type=int, nargs="+", default=[5])
+    parser.add_argument("--neighbourhood", type=int, nargs="+", default=[5])
+    parser.add_argument("--wolf-threshold", type=int, nargs="+", default=[1])
+    parser.add_argument("--sheep-threshold", type=int, nargs="+",
+                        default=[100])
+    parser.add_argument("--regrowth", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--diffusion", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--sheep-move-cost", type=float, nargs="+",
+                        default=[0.0])
+    parser.add_argument("--wolf-move-cost", type=float, nargs="+",
+                        default=[0.0])
+    parser.add_argument("--death-rate", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--starvation", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--replicates", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--environment", default="in.txt")
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args(argv)
+    for name, values in (("regrowth", args.regrowth),
+                         ("diffusion", args.diffusion)):
+        if not all(0 <= value <= 1 for value in values):
+            parser.error("--{} must be between 0 and 1".format(name))
+
+    grid = {"num_of_sheep": args.sheep,
+            "num_of_wolves": args.wolves,
+            "neighbourhood": args.neighbourhood,
+            "wolf_threshold": args.wolf_threshold,
+            "sheep_threshold": args.sheep_threshold,
+            "regrowth": args.regrowth,
+            "diffusion": args.diffusion,
+            "sheep_move_cost": args.sheep_move_cost,
+            "wolf_move_cost": args.wolf_move_cost,
+            "death_rate": args.death_rate,
+            "starvation": args.starvation}
+    rows = sweep(grid, args.replicates, args.iterations, args.processes,
+                 args.seed, args.environment)
+    write_csv(rows, args.output)
+    print("Wrote {} rows to {}".format(len(rows), args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Measures where the time of each step of the population model goes.
+
+This script defines the Profiler class. When a profiler is attached to a
+simulation, the wall time of every phase of every step is recorded alongside
+the size of the flock and wolf pack and the number of steps completed per
+second. Functions can be registered to receive these metrics after every step,
+for example to show them within the GUI. A simulation without a profiler
+records nothing.
+
+  Typical usage example:
+
+  profiler = Profiler(callback=print)
+  simulation.profiler = profiler
+  simulation.run(100)
+  profiler.summary()
+"""
+
+# Import required modules
+import time
+
+
+# Phases of a step, in the order they happen
+PHASES = ("shuffle", "sheep_move", "sheep_eat", "sheep_share",
+          "sheep_reproduce", "wolf_move", "wolf_eat", "wolf_reproduce",
+          "mortality", "births", "regrow", "render")
+
+
+class Profiler:
+    """Profiler class, used to record the time spent within each phase.
+
+    Attributes:
+        last: Metrics of the most recent step, or None before the first step
+        totals: Dictionary mapping each phase to its total time in seconds
+        steps: Number of steps recorded
+        steps_per_second: Smoothed number of steps completed per second
+    """
+
+    def __init__(self, callback=None, smoothing=0.1):
+        """Inits Profiler with an optional callback.
+
+        Args:
+            callback: Function called with the metrics of every step
+            smoothing: Weight given to the newest step when smoothing the
+                       number of steps per second
+        """
+        self._callbacks = [] if callback is None else [callback]
+        self._smoothing = smoothing
+        self._phases = {}
+        self._started = None
+        self._finished = None
+        self.last = None
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.steps = 0
+        self.steps_per_second = 0.0
+
+    def add_callback(self, callback):
+        """Registers a function to be called with the metrics of every step."""
+        self._callbacks.append(callback)
+
+    def begin_step(self):
+        """Marks the start of a step."""
+        self._phases = {}
+        self._started = time.perf_counter()
+
+    def record(self, phase, seconds):
+        """Records the time taken by a phase.
+
+        Phases recorded once a step has ended, such as drawing it, are added
+        to the metrics of that step.
+        """
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        if self._started is None and self.last is not None:
+            self.last["phases"][phase] = seconds
+        else:
+            self._phases[phase] = self._phases.get(phase, 0.0) + seconds
+
+    def end_step(self, simulation):
+        """Marks the end of a step and passes its metrics to every callback.
+
+        Args:
+            simulation: Simulation which has completed the step
+
+        Returns:
+            Dictionary of the metrics of the step
+        """
+        now = time.perf_counter()
+        if self._finished is not None and now > self._finished:
+            rate = 1.0 / (now - self._finished)
+            if self.steps_per_second:
+                rate = (self._smoothing * rate +
+                        (1 - self._smoothing) * self.steps_per_second)
+            self.steps_per_second = rate
+        self._finished = now
+        self.steps += 1
+        self.last = {"iteration": simulation.iteration,
+                     "step_time": now - self._started,
+                     "phases": self._phases,
+                     "sheep": len(simulation.flock),
+                     "wolves": len(simulation.wolves),
+                     "steps_per_second": self.steps_per_second}
+        self._started = None
+        for callback in self._callbacks:
+            callback(self.last)
+        return self.last
+
+    def summary(self):
+        """Returns a table of the total and mean time spent in each phase."""
+        lines = ["{:<18} {:>10} {:>12}".format("phase", "total (s)",
+                                               "mean (ms)")]
+        for phase, seconds in self.totals.items():
+            mean = 1000 * seconds / self.steps if self.steps else 0.0
+            lines.append("{:<18} {:>10.3f} {:>12.3f}".format(phase, seconds,
+                                                             mean))
+        lines.append("{:<18} {:>10.1f}".format("steps/s",
+                                               self.steps_per_second))
+        return "\n".join(lines)
+
+
+def format_status(metrics):
+    """Formats the metrics of a step as a single line for a status bar."""
+    phases = sorted(metrics["phases"].items(), key=lambda item: -item[1])
+    slowest = ", ".join("{} {:.1f}ms".format(phase, 1000 * seconds)
+                        for phase, seconds in phases[:3])
+    return ("Iteration {}  Sheep: {}  Wolves: {}  {:.1f} steps/s  "
+            "({})".format(metrics["iteration"], metrics["sheep"],
+                          metrics["wolves"], metrics["steps_per_second"],
+                          slowest))
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Keeps running statistics of the environment as it changes.
+
+This script defines the Tracker class. The tracker holds the total resource
+within the environment and the sum of every square tile of it, and is told
+about each change made to the environment, so that these statistics are
+updated in proportion to the number of cells changed rather than by scanning
+the whole grid. Sums are only taken when first asked for, so creating a
+tracker does not read the environment. It also collects the cells changed
+since they were last taken, so that a renderer can redraw only those cells.
+
+  Typical usage example:
+
+  tracker = Tracker(environment)
+  cells, taken = flock.graze()
+  tracker.record(cells, -taken)
+  tracker.total
+"""
+
+# Import required modules
+import numpy
+
+
+class Tracker:
+    """Tracker class, used to keep running sums of an environment.
+
+    Changes to the environment are either recorded cell by cell with record,
+    or, after the whole environment has changed, by calling refresh. Tiles
+    are only summed once they are first read, so a memory-mapped environment
+    is not read from disk until its sums are needed, and then only for the
+    tiles asked for. Tiles which have already been summed are kept up to
+    date by record.
+
+    Attributes:
+        environment: 2-D array modelling the environment
+        tile: Width and height of each tile, tiles at the right and bottom
+              edges may be smaller
+        tiles: 2-D array of the sum of every tile
+        total: Sum of the whole environment
+    """
+
+    def __init__(self, environment, tile=64):
+        """Inits Tracker with environment and tile, without reading it."""
+        self.environment = environment
+        self.tile = tile
+        height, width = environment.shape
+        shape = (-(-height // tile), -(-width // tile))
+        self._tiles = numpy.zeros(shape, dtype=numpy.float64)
+        self.refresh()
+
+    def refresh(self):
+        """Forgets every sum, e.g. after the whole environment has regrown,
+        and marks every cell as changed."""
+        self._known = numpy.zeros(self._tiles.shape, dtype=bool)
+        self._total = None
+        self._dirty = []
+        self._pending = 0
+        self._everything = True
+
+    def tile_sum(self, row, column):
+        """Returns the sum of the tile at row, column of the grid of tiles,
+        summing it if it has not been read since it was last refreshed."""
+        if not self._known[row, column]:
+            tile = self.tile
+            self._tiles[row, column] = self.environment[
+                row * tile:(row + 1) * tile,
+                column * tile:(column + 1) * tile].sum(dtype=numpy.float64)
+            self._known[row, column] = True
+        return float(self._tiles[row, column])
+
+    @property
+    def tiles(self):
+        """2-D array of the sum of every tile, summing any not yet read a
+        band of tiles at a time."""
+        tile = self.tile
+        width = self.environment.shape[1]
+        for row in numpy.flatnonzero(~self._known.all(axis=1)):
+            if self._known[row].any():
+                for column in numpy.flatnonzero(~self._known[row]):
+                    self.tile_sum(row, column)
+                continue
+            band = self.environment[row * tile:(row + 1) * tile]
+            self._tiles[row] = numpy.add.reduceat(
+                band.sum(axis=0, dtype=numpy.float64),
+                numpy.arange(0, width, tile))
+            self._known[row] = True
+        return self._tiles
+
+    @property
+    def total(self):
+        """Sum of the whole environment, summing any tiles not yet read."""
+        if self._total is None:
+            self._total = float(self.tiles.sum())
+        return self._total
+
+    def record(self, cells, change):
+        """Records changes made to some cells of the environment.
+
+        Only the sums already known are updated, tiles not yet read are
+        summed with the change already made once they are.
+
+        Args:
+            cells: Array of the flat indices of the cells changed, which may
+                   repeat
+            change: Array of the amount added to each of cells, negative for
+                    amounts taken
+        """
+        if len(cells) == 0:
+            return
+        width = self.environment.shape[1]
+        tile = self.tile
+        columns = self._tiles.shape[1]
+        rows, cols = numpy.divmod(cells, width)
+        change = numpy.asarray(change, dtype=numpy.float64)
+        tiles = (rows // tile) * columns + cols // tile
+        known = self._known.reshape(-1)[tiles]
+        numpy.add.at(self._tiles.reshape(-1), tiles[known], change[known])
+        if self._total is not None:
+            self._total += float(change.sum())
+        if not self._everything:
+            self._dirty.append(numpy.asarray(cells, dtype=numpy.int64))
+            self._pending += len(cells)
+            # Once a large part of the grid has changed it is quicker to
+            # treat every cell as changed than to track each one
+            if self._pending > self.environment.size // 8:
+                self._dirty = []
+                self._everything = True
+
+    def take_dirty(self):
+        """Returns the cells changed since the last call, and forgets them.
+
+        Returns:
+            Sorted array of the flat indices of the cells changed, or None if
+            every cell may have changed
+        """
+        if self._everything:
+            found = None
+        elif self._dirty:
+            found = numpy.unique(numpy.concatenate(self._dirty))
+        else:
+            found = numpy.empty(0, dtype=numpy.int64)
+        self._dirty = []
+        self._pending = 0
+        self._everything = False
+        return found
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"
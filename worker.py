@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Runs a simulation of the population model within a background process.
+
+This script defines the SimulationWorker class. The worker builds and runs a
+simulation within its own process and publishes snapshots of it through a
+small bounded queue. A snapshot is only taken when there is room in the queue,
+so a slow reader simply receives fewer snapshots, and the model never waits
+for it. The reader takes the newest snapshot whenever it is ready to draw,
+which keeps a GUI responsive however slow each iteration is.
+
+  Typical usage example:
+
+  worker = SimulationWorker((10, 5, 5, 1, 100), 50)
+  snapshot, metrics = worker.latest()
+  worker.stop()
+"""
+
+# Import required modules
+import multiprocessing
+import queue
+import time
+import export
+import simulation
+import telemetry
+
+
+def _snapshot(model, profiler):
+    """Returns a snapshot of the model along with its latest metrics."""
+    return export.Snapshot(model), None if profiler is None else profiler.last
+
+
+def _work(arguments, num_of_iterations, snapshots, stop, rate, profile):
+    """Runs a simulation within the worker process.
+
+    A snapshot of the initial state and of the final state are always
+    published. Snapshots of the iterations in between are published when the
+    queue has room, and None is queued once the run is over.
+    """
+    try:
+        model = simulation.Simulation.create(*arguments)
+        profiler = telemetry.Profiler() if profile else None
+        model.profiler = profiler
+        snapshots.put(_snapshot(model, None))
+        start = time.perf_counter()
+        for i in range(num_of_iterations):
+            if stop.is_set():
+                return
+            if rate:
+                delay = start + i / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            model.step()
+            if i < num_of_iterations - 1 and not snapshots.full():
+                try:
+                    snapshots.put_nowait(_snapshot(model, profiler))
+                except queue.Full:
+                    pass
+        # Wait for room for the final snapshot, unless asked to stop
+        item = _snapshot(model, profiler)
+        while not stop.is_set():
+            try:
+                snapshots.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+    finally:
+        snapshots.put(None)
+
+
+class SimulationWorker:
+    """SimulationWorker class, used to run a simulation in the background.
+
+    The simulation is built from the arguments of
+    simulation.Simulation.create within a separate process, so that the
+    process drawing it is never held up by the model.
+
+    Attributes:
+        finished: True once every snapshot of the run has been read
+    """
+
+    def __init__(self, arguments, num_of_iterations, rate=None,
+                 profile=False, maxsize=1):
+        """Inits SimulationWorker and starts the run.
+
+        Args:
+            arguments: Tuple of positional arguments of
+                       simulation.Simulation.create
+            num_of_iterations: Number of iterations to run
+            rate: Optional greatest number of iterations run per second
+            profile: If True a profiler is attached to the run and its
+                     metrics are published along with each snapshot
+            maxsize: Number of snapshots which may wait in the queue
+        """
+        context = multiprocessing.get_context("spawn")
+        self._snapshots = context.Queue(maxsize)
+        self._stop = context.Event()
+        self._process = context.Process(
+            target=_work, args=(arguments, num_of_iterations,
+                                self._snapshots, self._stop, rate, profile),
+            daemon=True)
+        self._process.start()
+        self.finished = False
+
+    def latest(self):
+        """Returns the newest snapshot published, dropping any older ones.
+
+        Returns:
+            Tuple of an export.Snapshot and the metrics of the iteration it
+            shows, or None if nothing new has been published
+        """
+        newest = None
+        while not self.finished:
+            try:
+                item = self._snapshots.get_nowait()
+            except queue.Empty:
+                # A worker which has died without finishing its run will
+                # publish nothing more
+                if self._process.exitcode is not None:
+                    self.finished = True
+                break
+            if item is None:
+                self.finished = True
+            else:
+                newest = item
+        return newest
+
+    def stop(self, timeout=5):
+        """Stops the run and waits for the worker process to exit."""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        while self._process.is_alive() and time.monotonic() < deadline:
+            self.latest()
+            self._process.join(0.05)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self.finished = True
+
+
+__author__ = "Michael Gibson"
+__copyright__ = "Copyright 201i, Michael Gibson"
+__license__ = "MIT"
+__version__ = "1"
+__maintainer__ = "Michael Gibsosn"
+__email__ = "mjggibson4@gmail.com"
+__status__ = "Production"